@@ -0,0 +1,274 @@
+"""
+Benchmarks for the extraction pipeline
+Runs on synthetic videos so results are reproducible offline
+
+Usage: python benchmark.py [sampling] [parallel] [adaptive] [hashing] [cleaning] [faces]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.video_processor import VideoProcessor, av
+from services.page_detector import PageDetector
+from services.frame_analysis import FrameAnalysis, make_proxy
+from services.frame_cleaner import FrameCleaner
+from services.frame_hasher import FrameHasher
+from test_agentic import add_face
+
+
+def make_lecture_video(
+    path: Path, duration: float = 60.0, fps: int = 30,
+    size: tuple = (720, 1280), seconds_per_slide: float = 10.0
+) -> Path:
+    """Write a synthetic lecture: static slides with a moving cursor."""
+    h, w = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+    rng = np.random.default_rng(0)
+
+    slide = None
+    for i in range(int(duration * fps)):
+        if i % int(seconds_per_slide * fps) == 0:
+            slide = np.full((h, w, 3), 245, dtype=np.uint8)
+            for line in range(6):
+                y = 120 + line * 90
+                cv2.putText(slide, f"Bullet point {rng.integers(1000)}", (80, y),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+
+        frame = slide.copy()
+        cv2.circle(frame, ((i * 7) % w, (i * 3) % h), 8, (0, 0, 255), -1)
+        writer.write(frame)
+
+    writer.release()
+    return path
+
+
+def bench_sampling(workdir: Path):
+    """Decode throughput of each sampling mode at 0.5, 1 and 2 fps."""
+    video_path = make_lecture_video(workdir / "lecture_720p.mp4")
+
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    print(f"\nSampling benchmark ({total_frames} source frames, 1280x720)")
+    print("-" * 60)
+    print(f"{'mode':>8} {'fps':>5} {'samples':>8} {'seconds':>8} {'src frames/s':>13}")
+
+    modes = ('read', 'grab', 'seek') + (('keyframe',) if av is not None else ())
+
+    for fps in (0.5, 1, 2):
+        for mode in modes:
+            processor = VideoProcessor(fps=fps, sampling=mode)
+
+            start = time.perf_counter()
+            samples = sum(1 for _ in processor.iter_frames(video_path))
+            elapsed = time.perf_counter() - start
+
+            print(f"{mode:>8} {fps:>5} {samples:>8} {elapsed:>8.2f} "
+                  f"{total_frames / elapsed:>13.0f}")
+
+
+def bench_parallel(workdir: Path):
+    """Decode time of a long video with 1..N worker processes."""
+    video_path = make_lecture_video(workdir / "long_720p.mp4", duration=240.0)
+
+    print(f"\nParallel decoding benchmark (240 s, 1280x720, {os.cpu_count()} CPUs)")
+    print("-" * 60)
+    print(f"{'workers':>8} {'samples':>8} {'seconds':>8} {'speedup':>8}")
+
+    baseline = None
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        processor = VideoProcessor(fps=1, workers=workers)
+
+        start = time.perf_counter()
+        samples = sum(1 for _ in processor.iter_frames(video_path))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+
+        print(f"{workers:>8} {samples:>8} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+        workers *= 2
+
+
+def bench_adaptive(workdir: Path):
+    """Decoded samples and time: uniform 1 fps vs adaptive bisection."""
+    video_path = make_lecture_video(workdir / "long_720p.mp4", duration=240.0)
+    detector = PageDetector()
+
+    print("\nAdaptive sampling benchmark (240 s, 1280x720, 10 s slides)")
+    print("-" * 60)
+    print(f"{'mode':>12} {'samples':>8} {'seconds':>8}")
+
+    workers = os.cpu_count() or 1
+    for name, differ, processes in (
+        ('uniform', None, 1),
+        ('adaptive', detector.is_page_change, 1),
+        (f'adaptive x{workers}', detector.is_page_change, workers),
+    ):
+        processor = VideoProcessor(fps=1, workers=processes)
+
+        start = time.perf_counter()
+        samples = sum(1 for _ in processor.iter_frames(
+            video_path, with_proxy=True, differ=differ
+        ))
+        elapsed = time.perf_counter() - start
+
+        print(f"{name:>12} {samples:>8} {elapsed:>8.2f}")
+
+
+def bench_hashing(workdir: Path):
+    """Hashes/sec: per-frame imagehash (old inline path) vs batched FrameHasher."""
+    import imagehash
+    from PIL import Image
+    
+    video_path = make_lecture_video(workdir / "lecture_720p.mp4", seconds_per_slide=2.0)
+    frames = [frame for frame, _ in VideoProcessor(fps=10).iter_frames(video_path)]
+    proxies = [make_proxy(frame) for frame in frames]
+    
+    print(f"\nHashing benchmark ({len(frames)} frames, 1280x720)")
+    print("-" * 60)
+    print(f"{'method':>26} {'seconds':>8} {'hashes/s':>10}")
+    
+    def run(name, fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>26} {elapsed:>8.3f} {len(frames) / elapsed:>10.0f}")
+    
+    run('imagehash, full BGR frame', lambda: [
+        imagehash.phash(Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)), hash_size=8)
+        for f in frames
+    ])
+    run('imagehash, proxy', lambda: [
+        imagehash.phash(Image.fromarray(p), hash_size=8) for p in proxies
+    ])
+    for method in ('phash', 'dhash', 'ahash'):
+        hasher = FrameHasher(method)
+        run(f'FrameHasher {method}, proxy', lambda: hasher.hash_batch(proxies))
+
+
+def bench_cleaning(workdir: Path):
+    """Per-page cleaning time: bare arrays (each check converts again) vs one
+    FrameAnalysis, and with obstructions tracked across the video."""
+    cleaner = FrameCleaner()
+    rng = np.random.default_rng(0)
+    
+    # Pages that pass the quality check, so every stage actually runs
+    frames = []
+    for _ in range(20):
+        frame = np.full((720, 1280, 3), 200, dtype=np.uint8)
+        for line in range(6):
+            cv2.putText(frame, f"Bullet point {rng.integers(1000)}", (80, 120 + line * 90),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+        frames.append(frame)
+    
+    async def clean(pages, tracker=None):
+        # What process_video does per page
+        for page in pages:
+            if not cleaner.is_low_quality(page):
+                await cleaner.remove_obstructions(page, tracker=tracker)
+    
+    def checks(pages):
+        # The same steps without face detection, whose cost hides the rest
+        for page in pages:
+            cleaner.is_low_quality(page)
+            cleaner.is_low_quality(page)  # repeated inside remove_obstructions
+            cleaner._detect_overlays(page)
+            FrameAnalysis.of(page).gray  # Haar input
+            cleaner.is_valid_cleaned_frame(page)
+    
+    print(f"\nCleaning benchmark ({len(frames)} pages, 1280x720)")
+    print("-" * 60)
+    print(f"{'input':>26} {'ms/page':>8} {'checks ms/page':>15}")
+    
+    def run(name, wrap, tracked=False):
+        start = time.perf_counter()
+        asyncio.run(clean([wrap(frame) for frame in frames], cleaner.tracker() if tracked else None))
+        total = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        for _ in range(10):
+            checks([wrap(frame) for frame in frames])
+        checked = (time.perf_counter() - start) / 10
+        
+        print(f"{name:>26} {1000 * total / len(frames):>8.1f} {1000 * checked / len(frames):>15.2f}")
+    
+    run('bare array', lambda frame: frame)
+    run('shared FrameAnalysis', FrameAnalysis)
+    run('FrameAnalysis + tracker', FrameAnalysis, tracked=True)
+
+
+def bench_faces(workdir: Path):
+    """Per-frame Haar latency: full-resolution scan vs downscaled corners-first."""
+    cleaner = FrameCleaner()
+    
+    def full_resolution(frame):
+        # The detection as it ran before: whole frame, native resolution
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cleaner.face_cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+        )
+    
+    def run(name, detect, frames, repeats=5):
+        found = len(detect(frames[0]))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for frame in frames:
+                detect(frame)
+        ms = 1000 * (time.perf_counter() - start) / (repeats * len(frames))
+        print(f"{name:>34} {ms:>8.1f} {found:>6}")
+    
+    for h, w in [(720, 1280), (1080, 1920)]:
+        slide = np.full((h, w, 3), 245, dtype=np.uint8)
+        for line in range(6):
+            cv2.putText(slide, f"Bullet point {line}", (w // 16, h // 6 + line * h // 9),
+                        cv2.FONT_HERSHEY_SIMPLEX, w / 900, (20, 20, 20), 3)
+        size = h // 8
+        facecam = add_face(slide, (w - size - 10, h - size - 10), size)
+        
+        print(f"\nFace detection benchmark ({w}x{h})")
+        print("-" * 60)
+        print(f"{'detector, frame':>34} {'ms/frame':>8} {'faces':>6}")
+        for label, frame in [('slide', slide), ('facecam', facecam)]:
+            run(f'full resolution, {label}', full_resolution, [frame])
+            # Fresh frame per call, as the pipeline sees it (no memoized grays)
+            run(f'corners first, {label}', cleaner._detect_faces_haar, [frame])
+
+
+BENCHMARKS = {
+    'sampling': bench_sampling,
+    'parallel': bench_parallel,
+    'adaptive': bench_adaptive,
+    'hashing': bench_hashing,
+    'cleaning': bench_cleaning,
+    'faces': bench_faces,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('names', nargs='*',
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    print("=" * 60)
+    print("  YouTube Notes Extractor - Benchmarks")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.names or BENCHMARKS:
+            BENCHMARKS[name](Path(tmp))
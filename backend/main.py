@@ -1,20 +1,33 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, HttpUrl, Field
 import os
 from pathlib import Path
 from typing import Optional
 import uuid
 from datetime import datetime
 import asyncio
+import aiofiles
+import functools
+import logging
+import threading
 
 from services.video_processor import VideoProcessor
+from services.download_cache import DownloadCache
+from services.slide_cache import SlideCache
+from services.format_selector import FormatSelector
+from services.frame_store import FrameStore
+from services.frame_analysis import FrameAnalysis
 from services.frame_cleaner import FrameCleaner
 from services.page_detector import PageDetector
+from services.slide_locator import SlideLocator
 from services.ocr_engine import OCREngine
 from services.pdf_generator import PDFGenerator
 
+# Services log format selection, cache hits and sampling fallbacks
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
 app = FastAPI(
     title="YouTube Notes Extractor API",
     description="Extract clean study notes from YouTube videos",
@@ -30,20 +43,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-video_processor = VideoProcessor()
-frame_cleaner = FrameCleaner()
-page_detector = PageDetector()
-ocr_engine = OCREngine()
-pdf_generator = PDFGenerator()
-
 # Storage paths
 BASE_DIR = Path(__file__).parent
 TEMP_DIR = BASE_DIR / "temp"
 OUTPUT_DIR = BASE_DIR / "output"
+CACHE_DIR = Path(os.getenv("CACHE_DIR", BASE_DIR / "cache"))
 TEMP_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Uploads are streamed to disk in chunks of this size, up to a maximum
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 4 * 1024 ** 3))
+
+# Initialize services
+download_cache = DownloadCache(
+    CACHE_DIR, max_bytes=int(os.getenv("DOWNLOAD_CACHE_BYTES", 20 * 1024 ** 3))
+)
+# Cleaned images and OCR text of slides seen in earlier videos
+slide_cache = SlideCache(
+    CACHE_DIR / "slides.db", max_bytes=int(os.getenv("SLIDE_CACHE_BYTES", 2 * 1024 ** 3))
+)
+ocr_engine = OCREngine()
+# Downloads the lowest resolution at which OCR can still read the slides
+format_selector = FormatSelector(
+    ocr_engine, min_confidence=float(os.getenv("LEGIBILITY_MIN_CONFIDENCE", 0.6))
+)
+video_processor = VideoProcessor(
+    workers=os.cpu_count() or 1, cache=download_cache, format_selector=format_selector
+)
+frame_cleaner = FrameCleaner()
+page_detector = PageDetector()
+slide_locator = SlideLocator()
+pdf_generator = PDFGenerator()
+
 # In-memory job storage (use Redis in production)
 jobs = {}
 
@@ -51,6 +83,19 @@ jobs = {}
 class VideoRequest(BaseModel):
     url: HttpUrl
     quality: Optional[str] = "720p"
+    # Decode straight from the network while the video downloads
+    progressive: bool = False
+    # Only extract this span (seconds), or one chapter by title or number
+    start: Optional[float] = Field(None, ge=0)
+    end: Optional[float] = Field(None, gt=0)
+    chapter: Optional[str] = None
+
+
+class LocalVideoRequest(BaseModel):
+    # Path of a video on local storage or a mounted share (see LOCAL_MEDIA_ROOTS)
+    path: str
+    start: Optional[float] = Field(None, ge=0)
+    end: Optional[float] = Field(None, gt=0)
 
 
 class JobStatus(BaseModel):
@@ -60,6 +105,10 @@ class JobStatus(BaseModel):
     message: str
     pdf_url: Optional[str] = None
     error: Optional[str] = None
+    # Live download progress (bytes, bytes/s) while status is "downloading"
+    downloaded_bytes: Optional[int] = None
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None
 
 
 @app.get("/")
@@ -77,6 +126,10 @@ async def extract_notes(request: VideoRequest, background_tasks: BackgroundTasks
     Start the extraction process for a YouTube video.
     Returns a job ID for tracking progress.
     """
+    check_time_range(request.start, request.end)
+    if request.chapter and (request.start is not None or request.end is not None):
+        raise HTTPException(status_code=400, detail="Give either a chapter or start/end, not both")
+    
     job_id = str(uuid.uuid4())
     
     jobs[job_id] = {
@@ -92,7 +145,121 @@ async def extract_notes(request: VideoRequest, background_tasks: BackgroundTasks
         process_video,
         job_id=job_id,
         url=str(request.url),
-        quality=request.quality
+        quality=request.quality,
+        progressive=request.progressive,
+        start=request.start,
+        end=request.end,
+        chapter=request.chapter
+    )
+    
+    return JobStatus(
+        job_id=job_id,
+        status="queued",
+        progress=0,
+        message="Extraction job started"
+    )
+
+
+def check_time_range(start: Optional[float], end: Optional[float]):
+    """Reject a start/end pair that selects nothing."""
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+
+def local_media_roots() -> list:
+    """Directories local-path extraction may read from (LOCAL_MEDIA_ROOTS)."""
+    roots = os.getenv("LOCAL_MEDIA_ROOTS", "")
+    return [Path(root).resolve() for root in roots.split(os.pathsep) if root]
+
+
+@app.post("/api/extract/local", response_model=JobStatus)
+async def extract_notes_local(request: LocalVideoRequest, background_tasks: BackgroundTasks):
+    """
+    Start extraction for a video that is already on local storage.
+    The file is decoded in place: nothing is downloaded or copied.
+    """
+    check_time_range(request.start, request.end)
+    video_path = Path(request.path).resolve()
+    
+    roots = local_media_roots()
+    if not any(video_path.is_relative_to(root) for root in roots):
+        raise HTTPException(status_code=403, detail="Path is outside LOCAL_MEDIA_ROOTS")
+    
+    if not video_path.is_file() or not os.access(video_path, os.R_OK):
+        raise HTTPException(status_code=404, detail="Video file not found or not readable")
+    
+    job_id = str(uuid.uuid4())
+    
+    jobs[job_id] = {
+        "status": "queued",
+        "progress": 0,
+        "message": "Job queued",
+        "created_at": datetime.now(),
+        "url": str(video_path)
+    }
+    
+    background_tasks.add_task(
+        process_video,
+        job_id=job_id,
+        url=str(video_path),
+        quality=None,
+        video_path=video_path,
+        start=request.start,
+        end=request.end
+    )
+    
+    return JobStatus(
+        job_id=job_id,
+        status="queued",
+        progress=0,
+        message="Extraction job started"
+    )
+
+
+@app.post("/api/extract/upload", response_model=JobStatus)
+async def extract_notes_upload(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """
+    Start extraction for an uploaded video.
+    The upload is streamed to the job's temp directory in chunks, without
+    blocking the event loop; uploads over MAX_UPLOAD_BYTES are refused.
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload exceeds MAX_UPLOAD_BYTES")
+    
+    job_id = str(uuid.uuid4())
+    
+    job_dir = TEMP_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    video_path = job_dir / f"upload{Path(file.filename or '').suffix or '.mp4'}"
+    
+    size = 0
+    try:
+        async with aiofiles.open(video_path, 'wb') as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Upload exceeds MAX_UPLOAD_BYTES")
+                await f.write(chunk)
+    except Exception:
+        video_processor.cleanup(job_dir)
+        raise
+    finally:
+        await file.close()
+    
+    jobs[job_id] = {
+        "status": "queued",
+        "progress": 0,
+        "message": "Job queued",
+        "created_at": datetime.now(),
+        "url": file.filename
+    }
+    
+    background_tasks.add_task(
+        process_video,
+        job_id=job_id,
+        url=file.filename,
+        quality=None,
+        video_path=video_path
     )
     
     return JobStatus(
@@ -116,7 +283,10 @@ async def get_job_status(job_id: str):
         progress=job["progress"],
         message=job["message"],
         pdf_url=job.get("pdf_url"),
-        error=job.get("error")
+        error=job.get("error"),
+        downloaded_bytes=job.get("downloaded_bytes"),
+        total_bytes=job.get("total_bytes"),
+        speed=job.get("speed")
     )
 
 
@@ -142,10 +312,88 @@ async def download_pdf(job_id: str):
     )
 
 
-async def process_video(job_id: str, url: str, quality: str):
+def report_download_progress(job_id: str, stats: dict):
+    """
+    Record byte-level download progress on a job.
+    Called from the download thread; the download maps to 10-25% overall.
+    """
+    downloaded, total, speed = stats["downloaded_bytes"], stats["total_bytes"], stats["speed"]
+    
+    message = f"Downloading video... {downloaded / 1e6:.1f} MB"
+    if total:
+        message += f" / {total / 1e6:.1f} MB"
+    if speed:
+        message += f" ({speed / 1e6:.1f} MB/s)"
+    
+    jobs[job_id].update({
+        "progress": 10 + int(15 * min(downloaded / total, 1.0)) if total else 10,
+        "message": message,
+        "downloaded_bytes": downloaded,
+        "total_bytes": total,
+        "speed": speed
+    })
+
+
+def report_detection_progress(
+    job_id: str, timestamp: float, start: Optional[float], end: Optional[float]
+):
+    """
+    Record decoding progress on a job.
+    Called from the detection thread; cleaning and OCR keep pace with
+    decoding, so the decoded share of [start, end] maps to 25-90% overall.
+    """
+    start = start or 0.0
+    if end is None or end <= start:
+        return
+    
+    done = min(max((timestamp - start) / (end - start), 0.0), 1.0)
+    jobs[job_id]["progress"] = 25 + int(65 * done)
+
+
+def detect_pages(
+    video_path, start: Optional[float], end: Optional[float], session,
+    loop: asyncio.AbstractEventLoop, pages: asyncio.Queue, stop: threading.Event,
+    crop=None, progress=None
+):
+    """
+    Decode and detect pages in a worker thread.
+    Each finished page is put on the queue as soon as the session emits it;
+    None marks the end of the video (or of a failed run). crop, if given,
+    cuts the slide out of every frame before detection; progress, if given,
+    is called with the timestamp of every decoded frame.
+    """
+    try:
+        frames = video_processor.iter_frames(
+            video_path, with_proxy=True,
+            differ=functools.partial(page_detector.is_page_change, mask=session.mask),
+            start=start, end=end, transform=crop
+        )
+        for frame, timestamp, proxy in frames:
+            if stop.is_set():
+                return
+            if progress is not None:
+                progress(timestamp)
+            for page in session.push(frame, timestamp, proxy):
+                loop.call_soon_threadsafe(pages.put_nowait, page)
+        
+        for page in session.flush():
+            loop.call_soon_threadsafe(pages.put_nowait, page)
+    finally:
+        loop.call_soon_threadsafe(pages.put_nowait, None)
+
+
+async def process_video(
+    job_id: str, url: str, quality: str, progressive: bool = False,
+    video_path: Optional[Path] = None, start: Optional[float] = None,
+    end: Optional[float] = None, chapter: Optional[str] = None
+):
     """
     Main processing pipeline for video extraction.
     This is the agentic core that self-corrects and adapts.
+    
+    When video_path is given (local file or upload) the download step is
+    skipped and the pipeline decodes that file directly. start/end (or a
+    chapter) limit both the download and decoding to that span.
     """
     print(f"\n{'='*60}")
     print(f"Starting extraction for job: {job_id}")
@@ -153,85 +401,172 @@ async def process_video(job_id: str, url: str, quality: str):
     print(f"Quality: {quality}")
     print(f"{'='*60}\n")
     
+    frame_store = None
+    detection = None
     try:
-        # Update status: Downloading
-        jobs[job_id].update({
-            "status": "downloading",
-            "progress": 10,
-            "message": "Downloading video..."
-        })
-        print(f"[{job_id}] Status: Downloading video...")
+        if chapter:
+            start, end = await video_processor.resolve_chapter(url, chapter)
+            print(f"[{job_id}] ✓ Chapter {chapter!r}: {start:.0f}s - {end:.0f}s")
         
-        video_path = await video_processor.download_video(url, quality, TEMP_DIR / job_id)
-        print(f"[{job_id}] ✓ Video downloaded: {video_path}")
+        if video_path:
+            print(f"[{job_id}] ✓ Using local video: {video_path}")
+        else:
+            # Update status: Downloading
+            jobs[job_id].update({
+                "status": "downloading",
+                "progress": 10,
+                "message": "Downloading video..."
+            })
+            print(f"[{job_id}] Status: Downloading video...")
         
-        # Update status: Extracting frames
-        jobs[job_id].update({
-            "status": "extracting",
-            "progress": 25,
-            "message": "Extracting frames..."
-        })
-        print(f"[{job_id}] Status: Extracting frames...")
+        if not video_path and progressive:
+            # Pipeline mode: the decoder reads the media URL directly, so
+            # frame extraction overlaps the download instead of following it
+            video_path = await video_processor.resolve_stream_url(url, quality)
+            if video_path:
+                print(f"[{job_id}] ✓ Streaming video while it downloads")
+            else:
+                print(f"[{job_id}] ⚠ No progressive format, downloading first")
         
-        frames = await video_processor.extract_frames(video_path)
-        print(f"[{job_id}] ✓ Extracted {len(frames)} frames")
+        if not video_path:
+            video_path = await video_processor.download_video(
+                url, quality, TEMP_DIR / job_id, start, end,
+                progress=lambda stats: report_download_progress(job_id, stats)
+            )
+            print(f"[{job_id}] ✓ Video downloaded: {video_path}")
+            
+            if (start is not None or end is not None) and video_processor.supports_sections:
+                # The file only holds the requested span, decode all of it
+                start = end = None
         
         # Update status: Detecting pages
+        # Decoding and page detection run in a worker thread and hand each
+        # page over as soon as it is finished, so cleaning and OCR of early
+        # pages overlap decoding of the rest of the video. Only the current
+        # page candidate is held in memory; detection runs on the low-res
+        # grayscale proxy of each frame, and sampling is adaptive: coarse
+        # probes, bisected where pages change.
         jobs[job_id].update({
             "status": "detecting",
-            "progress": 40,
-            "message": "Detecting unique pages..."
+            "progress": 25,
+            "message": "Extracting frames and detecting unique pages..."
         })
-        print(f"[{job_id}] Status: Detecting unique pages...")
+        print(f"[{job_id}] Status: Extracting frames and detecting unique pages...")
         
-        unique_frames = await page_detector.detect_unique_pages(frames)
-        print(f"[{job_id}] ✓ Detected {len(unique_frames)} unique pages")
+        # Look at a few samples once per video: where the slide sits inside
+        # the frame (conference captures, presenter views), so every stage
+        # only sees slide pixels, and which parts of it change all the time
+        # (facecam, animated overlays), so they don't look like new pages
+        samples = await asyncio.to_thread(
+            video_processor.sample_proxy_pairs, video_path, start=start, end=end
+        )
+        crop = slide_locator.transform(slide_locator.locate([a for a, _ in samples]))
+        if crop is not None:
+            samples = [(crop(a), crop(b)) for a, b in samples]
+            print(f"[{job_id}] ✓ Cropping frames to the slide area")
         
-        # Update status: Cleaning frames
-        jobs[job_id].update({
-            "status": "cleaning",
-            "progress": 60,
-            "message": f"Cleaning {len(unique_frames)} frames..."
-        })
-        print(f"[{job_id}] Status: Cleaning {len(unique_frames)} frames...")
+        slide_mask = page_detector.estimate_slide_mask(samples)
+        if slide_mask is not None:
+            print(f"[{job_id}] ✓ Ignoring {1 - slide_mask.mean():.0%} of the frame (facecam/overlays)")
         
-        cleaned_frames = []
-        for i, frame in enumerate(unique_frames):
-            # Self-correction: Check frame quality before cleaning
-            if frame_cleaner.is_low_quality(frame):
-                jobs[job_id]["message"] = f"Skipping low-quality frame {i+1}/{len(unique_frames)}"
-                print(f"[{job_id}] ⚠ Skipping low-quality frame {i+1}")
-                continue
-            
-            cleaned_frame = await frame_cleaner.remove_obstructions(frame)
-            
-            # Self-correction: Verify cleaning didn't corrupt the frame
-            if frame_cleaner.is_valid_cleaned_frame(cleaned_frame):
-                cleaned_frames.append(cleaned_frame)
-                print(f"[{job_id}] ✓ Cleaned frame {i+1}/{len(unique_frames)}")
-            else:
-                # Fallback to original if cleaning failed
-                cleaned_frames.append(frame)
-                print(f"[{job_id}] ⚠ Cleaning failed for frame {i+1}, using original")
+        # Pages go to a memory-mapped store on disk; later stages pass
+        # lightweight handles around and read pixels back zero-copy.
+        # Slides the lecturer comes back to later are only kept once.
+        frame_store = FrameStore(TEMP_DIR / job_id / "frames.bin")
+        session = page_detector.session(
+            store=frame_store, dedupe_threshold=5, mask=slide_mask
+        )
         
-        print(f"[{job_id}] ✓ Cleaned {len(cleaned_frames)} frames total")
+        # Progress follows decoding through the video (or the requested span)
+        span_end = end if end is not None else await asyncio.to_thread(
+            video_processor.duration, video_path
+        )
         
-        # Update status: OCR processing
-        jobs[job_id].update({
-            "status": "ocr",
-            "progress": 80,
-            "message": "Extracting text from frames..."
-        })
-        print(f"[{job_id}] Status: Extracting text (OCR)...")
+        pages = asyncio.Queue()
+        stop = threading.Event()
+        detection = asyncio.ensure_future(asyncio.to_thread(
+            detect_pages, video_path, start, end, session,
+            asyncio.get_running_loop(), pages, stop, crop,
+            lambda timestamp: report_detection_progress(job_id, timestamp, start, span_end)
+        ))
+        
+        # Facecams and overlays are detected on the first pages only and
+        # reused for the rest of the video
+        obstruction_tracker = frame_cleaner.tracker()
         
         frames_with_text = []
-        for i, frame in enumerate(cleaned_frames):
-            text = await ocr_engine.extract_text(frame)
-            frames_with_text.append({
-                "image": frame,
-                "text": text
-            })
-            print(f"[{job_id}] ✓ OCR processed frame {i+1}/{len(cleaned_frames)}")
+        page_count = 0
+        try:
+            while (info := await pages.get()) is not None:
+                page_count += 1
+                page = info.frame
+                frame = frame_store.get(page)
+                
+                jobs[job_id].update({
+                    "status": "cleaning",
+                    "message": f"Cleaning page {page_count} (still detecting)..."
+                })
+                
+                # Quality check, slide cache and cleaner share one analysis
+                # (grayscale, proxy, sharpness...) built from detection's proxy
+                analysis = FrameAnalysis(frame, info.proxy)
+                
+                # Self-correction: Check frame quality before cleaning
+                if frame_cleaner.is_low_quality(analysis):
+                    print(f"[{job_id}] ⚠ Skipping low-quality frame {page_count}")
+                    continue
+                
+                # Known slide: reuse its cleaned image and text. Keyed on the
+                # slide region only, so a facecam doesn't spoil the match.
+                slide_key = slide_cache.key(page_detector.apply_mask(analysis.proxy, session.mask))
+                cached = slide_cache.get(slide_key)
+                if cached is not None:
+                    # Kept on disk like decoded pages, not as a resident array
+                    image, text = cached
+                    page = frame_store.put(image, page.timestamp, page.page_id)
+                    frames_with_text.append({
+                        "image": frame_store.get(page),
+                        "text": text
+                    })
+                    print(f"[{job_id}] ✓ Reused known slide for frame {page_count}")
+                    continue
+                
+                cleaned_frame = await frame_cleaner.remove_obstructions(
+                    analysis, tracker=obstruction_tracker
+                )
+                
+                # Self-correction: Verify cleaning didn't corrupt the frame
+                if cleaned_frame is frame:
+                    # Nothing to remove, keep the stored original
+                    print(f"[{job_id}] ✓ Cleaned frame {page_count}")
+                elif frame_cleaner.is_valid_cleaned_frame(cleaned_frame):
+                    page = frame_store.put(cleaned_frame, page.timestamp, page.page_id)
+                    frame = frame_store.get(page)
+                    print(f"[{job_id}] ✓ Cleaned frame {page_count}")
+                else:
+                    # Fallback to original if cleaning failed
+                    print(f"[{job_id}] ⚠ Cleaning failed for frame {page_count}, using original")
+                
+                jobs[job_id].update({
+                    "status": "ocr",
+                    "message": f"Extracting text from page {page_count} (still detecting)..."
+                })
+                
+                text = await ocr_engine.extract_text(frame)
+                slide_cache.put(slide_key, frame, text)
+                frames_with_text.append({
+                    "image": frame,
+                    "text": text
+                })
+                print(f"[{job_id}] ✓ OCR processed frame {page_count}")
+        finally:
+            # Stop decoding early if a later stage failed
+            stop.set()
+        
+        # Re-raise any decoding/detection error
+        await detection
+        print(f"[{job_id}] ✓ Detected {page_count} unique pages, "
+              f"kept {len(frames_with_text)} after cleaning")
         
         # Update status: Generating PDF
         jobs[job_id].update({
@@ -249,21 +584,17 @@ async def process_video(job_id: str, url: str, quality: str):
         jobs[job_id].update({
             "status": "completed",
             "progress": 100,
-            "message": f"Successfully extracted {len(cleaned_frames)} pages",
+            "message": f"Successfully extracted {len(frames_with_text)} pages",
             "pdf_path": str(pdf_path),
             "pdf_url": f"/api/download/{job_id}"
         })
         
         print(f"\n{'='*60}")
         print(f"[{job_id}] ✅ EXTRACTION COMPLETE!")
-        print(f"Pages extracted: {len(cleaned_frames)}")
+        print(f"Pages extracted: {len(frames_with_text)}")
         print(f"PDF location: {pdf_path}")
         print(f"{'='*60}\n")
         
-        # Cleanup temporary files
-        video_processor.cleanup(TEMP_DIR / job_id)
-        print(f"[{job_id}] ✓ Cleaned up temporary files")
-        
     except Exception as e:
         print(f"\n{'='*60}")
         print(f"[{job_id}] ❌ ERROR: {str(e)}")
@@ -278,6 +609,19 @@ async def process_video(job_id: str, url: str, quality: str):
             "message": "Extraction failed",
             "error": str(e)
         })
+    finally:
+        if detection is not None:
+            # The decoder writes to the frame store until it sees stop
+            await asyncio.gather(detection, return_exceptions=True)
+        if frame_store is not None:
+            frame_store.close()
+        
+        # Let the download cache evict this video once no job uses it
+        video_processor.release_video(video_path)
+        
+        # Cleanup temporary files, whether the job succeeded or not
+        video_processor.cleanup(TEMP_DIR / job_id)
+        print(f"[{job_id}] ✓ Cleaned up temporary files")
 
 
 if __name__ == "__main__":
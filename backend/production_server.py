@@ -207,73 +207,18 @@ def process_video(job_id: str, url: str, quality: str):
         
         print(f"[{job_id}] ✓ Video downloaded: {video_path}")
         
-        # Update status: Extracting frames
+        # Update status: Extracting frames and detecting pages
         jobs[job_id].update({
             "status": "extracting",
             "progress": 25,
-            "message": "Extracting frames..."
+            "message": "Extracting frames and detecting unique pages..."
         })
-        print(f"[{job_id}] Status: Extracting frames...")
+        print(f"[{job_id}] Status: Extracting frames and detecting unique pages...")
         
-        # Extract frames
-        frames = []
-        cap = cv2.VideoCapture(str(video_path))
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(video_fps / 1)  # 1 frame per second
-        
-        frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_count % frame_interval == 0:
-                timestamp = frame_count / video_fps
-                frames.append((frame, timestamp))
-            
-            frame_count += 1
-        
-        cap.release()
-        print(f"[{job_id}] ✓ Extracted {len(frames)} frames")
-        
-        # Update status: Detecting pages
-        jobs[job_id].update({
-            "status": "detecting",
-            "progress": 40,
-            "message": "Detecting unique pages..."
-        })
-        print(f"[{job_id}] Status: Detecting unique pages...")
-        
-        # Detect unique pages using perceptual hashing
-        import imagehash
-        from PIL import Image
-        
-        unique_frames = []
-        last_hash = None
-        hash_threshold = 10
-        
-        for frame, timestamp in frames:
-            # Convert to PIL Image
-            pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            frame_hash = imagehash.phash(pil_image, hash_size=8)
-            
-            if last_hash is None or (frame_hash - last_hash) > hash_threshold:
-                unique_frames.append(frame)
-                last_hash = frame_hash
-        
-        print(f"[{job_id}] ✓ Detected {len(unique_frames)} unique pages")
-        
-        # Update status: OCR processing
-        jobs[job_id].update({
-            "status": "ocr",
-            "progress": 70,
-            "message": f"Extracting text from {len(unique_frames)} frames..."
-        })
-        print(f"[{job_id}] Status: Extracting text (OCR)...")
-        
-        # OCR processing
+        duration = info.get('duration') or 0
         frames_with_text = []
-        for i, frame in enumerate(unique_frames):
+        
+        def ocr_page(frame):
             # Preprocess for OCR
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             denoised = cv2.fastNlMeansDenoising(gray)
@@ -286,7 +231,29 @@ def process_video(job_id: str, url: str, quality: str):
                 "image": frame,
                 "text": text
             })
-            print(f"[{job_id}] ✓ OCR processed frame {i+1}/{len(unique_frames)}")
+            print(f"[{job_id}] ✓ OCR processed page {len(frames_with_text)}")
+        
+        # Frames are decoded lazily (1 per second, skipped frames are only
+        # grabbed) and pushed straight into the detection session; each page
+        # is OCR'd as soon as it is emitted, while decoding continues
+        session = page_detector.session()
+        
+        frame_count = 0
+        for frame, timestamp in video_processor.iter_frames(video_path):
+            frame_count += 1
+            for page in session.push(frame, timestamp):
+                ocr_page(page.frame)
+            
+            if duration:
+                jobs[job_id].update({
+                    "status": "ocr" if frames_with_text else "detecting",
+                    "progress": 25 + int(65 * min(1.0, timestamp / duration)),
+                    "message": f"Processed {len(frames_with_text)} pages ({timestamp:.0f}s of {duration:.0f}s)..."
+                })
+        for page in session.flush():
+            ocr_page(page.frame)
+        
+        print(f"[{job_id}] ✓ Extracted {frame_count} frames, {len(frames_with_text)} unique pages")
         
         # Update status: Generating PDF
         jobs[job_id].update({
@@ -378,14 +345,14 @@ def process_video(job_id: str, url: str, quality: str):
         jobs[job_id].update({
             "status": "completed",
             "progress": 100,
-            "message": f"Successfully extracted {len(unique_frames)} pages",
+            "message": f"Successfully extracted {len(frames_with_text)} pages",
             "pdf_path": str(pdf_path),
             "pdf_url": f"/api/download/{job_id}"
         })
         
         print(f"\n{'='*60}")
         print(f"[{job_id}] ✅ EXTRACTION COMPLETE!")
-        print(f"Pages extracted: {len(unique_frames)}")
+        print(f"Pages extracted: {len(frames_with_text)}")
         print(f"PDF location: {pdf_path}")
         print(f"{'='*60}\n")
         
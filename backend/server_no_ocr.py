@@ -15,6 +15,9 @@ import traceback
 import cv2
 import numpy as np
 
+from services.video_processor import VideoProcessor
+from services.page_detector import PageDetector
+
 app = FastAPI(
     title="YouTube Notes Extractor API",
     description="Extract slides from YouTube videos (No OCR)",
@@ -163,45 +166,22 @@ def process_video(job_id: str, url: str, quality: str):
         
         print(f"[{job_id}] ✓ Downloaded: {video_path}")
         
-        # Extract frames
-        jobs[job_id].update({"status": "extracting", "progress": 30, "message": "Extracting frames..."})
+        # Extract frames and detect unique slides
+        jobs[job_id].update({"status": "extracting", "progress": 30, "message": "Extracting frames and detecting unique slides..."})
         print(f"[{job_id}] Extracting frames...")
         
-        frames = []
-        cap = cv2.VideoCapture(str(video_path))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(fps)  # 1 frame per second
+        # Frames are decoded lazily (1 per second) and pushed straight into
+        # detection, so only the unique slides are kept in memory
+        session = PageDetector().session()
         
+        unique_frames = []
         frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame_count % frame_interval == 0:
-                frames.append(frame)
+        for frame, timestamp in VideoProcessor(fps=1).iter_frames(video_path):
             frame_count += 1
+            unique_frames.extend(page.frame for page in session.push(frame, timestamp))
+        unique_frames.extend(page.frame for page in session.flush())
         
-        cap.release()
-        print(f"[{job_id}] ✓ Extracted {len(frames)} frames")
-        
-        # Detect unique frames
-        jobs[job_id].update({"status": "detecting", "progress": 50, "message": "Detecting unique slides..."})
-        print(f"[{job_id}] Detecting unique slides...")
-        
-        import imagehash
-        from PIL import Image
-        
-        unique_frames = []
-        last_hash = None
-        threshold = 10
-        
-        for frame in frames:
-            pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            frame_hash = imagehash.phash(pil_img, hash_size=8)
-            
-            if last_hash is None or (frame_hash - last_hash) > threshold:
-                unique_frames.append(frame)
-                last_hash = frame_hash
+        print(f"[{job_id}] ✓ Extracted {frame_count} frames")
         
         print(f"[{job_id}] ✓ Found {len(unique_frames)} unique slides")
         
@@ -15,6 +15,9 @@ import traceback
 import cv2
 import numpy as np
 
+from services.video_processor import VideoProcessor
+from services.page_detector import PageDetector
+
 app = FastAPI(title="YouTube Notes Extractor", version="3.0.0-notes")
 
 app.add_middleware(
@@ -138,40 +141,29 @@ def process_video(job_id: str, url: str):
         print(f"[{job_id}] ✓ Downloaded: {video_title}")
         
         # Extract frames every 2 seconds (slower = better for lectures)
-        jobs[job_id].update({"status": "extracting", "progress": 25, "message": "Extracting frames..."})
+        jobs[job_id].update({"status": "extracting", "progress": 25, "message": "Extracting frames and finding unique slides..."})
         print(f"[{job_id}] Extracting frames...")
         
-        frames = []
-        cap = cv2.VideoCapture(str(video_path))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        interval = int(fps * 2)  # Every 2 seconds
-        
-        count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if count % interval == 0:
-                frames.append(frame)
-            count += 1
-        
-        cap.release()
-        print(f"[{job_id}] ✓ {len(frames)} frames extracted")
-        
-        # Detect unique slides
-        jobs[job_id].update({"status": "detecting", "progress": 40, "message": "Finding unique slides..."})
-        print(f"[{job_id}] Detecting unique slides...")
-        
-        import imagehash
-        from PIL import Image
+        # Every 2 seconds - sparse enough that the processor seeks between
+        # samples. Frames are decoded lazily and pushed straight into
+        # detection; only every 10th is kept for the fallback below.
+        session = PageDetector().session()
         
         unique = []
-        last_hash = None
+        interval_frames = []
+        frame_count = 0
+        for frame, timestamp in VideoProcessor(fps=0.5).iter_frames(video_path):
+            if frame_count % 10 == 0:
+                interval_frames.append(frame)
+            frame_count += 1
+            unique.extend(page.frame for page in session.push(frame, timestamp))
+        unique.extend(page.frame for page in session.flush())
+        
+        print(f"[{job_id}] ✓ {frame_count} frames extracted")
         
         if len(unique) == 0:
             print(f"[{job_id}] ⚠ No unique slides found (possibly too much motion/video)")
-            # Fallback: take frames at fixed intervals
-            interval_frames = frames[::10]  # Take every 10th frame captured
+            # Fallback: take frames at fixed intervals (every 10th frame captured)
             unique = interval_frames
             print(f"[{job_id}] -> Using {len(unique)} frames as fallback")
 
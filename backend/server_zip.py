@@ -15,6 +15,9 @@ import traceback
 import cv2
 import zipfile
 
+from services.video_processor import VideoProcessor
+from services.page_detector import PageDetector
+
 app = FastAPI(title="YouTube Notes Extractor", version="2.0.0-zip")
 
 app.add_middleware(
@@ -137,43 +140,20 @@ def process_video(job_id: str, url: str):
         print(f"[{job_id}] ✓ Downloaded")
         
         # Extract frames
-        jobs[job_id].update({"status": "extracting", "progress": 30, "message": "Extracting frames..."})
+        jobs[job_id].update({"status": "extracting", "progress": 30, "message": "Extracting frames and finding unique slides..."})
         print(f"[{job_id}] Extracting frames...")
         
-        frames = []
-        cap = cv2.VideoCapture(str(video_path))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        interval = int(fps)
-        
-        count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if count % interval == 0:
-                frames.append(frame)
-            count += 1
-        
-        cap.release()
-        print(f"[{job_id}] ✓ {len(frames)} frames")
-        
-        # Detect unique
-        jobs[job_id].update({"status": "detecting", "progress": 50, "message": "Finding unique slides..."})
-        print(f"[{job_id}] Detecting unique...")
-        
-        import imagehash
-        from PIL import Image
+        # Frames are decoded lazily and pushed straight into detection
+        session = PageDetector().session()
         
         unique = []
-        last_hash = None
+        frame_count = 0
+        for frame, timestamp in VideoProcessor(fps=1).iter_frames(video_path):
+            frame_count += 1
+            unique.extend(page.frame for page in session.push(frame, timestamp))
+        unique.extend(page.frame for page in session.flush())
         
-        for frame in frames:
-            pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            h = imagehash.phash(pil, hash_size=8)
-            
-            if last_hash is None or (h - last_hash) > 10:
-                unique.append(frame)
-                last_hash = h
+        print(f"[{job_id}] ✓ {frame_count} frames")
         
         print(f"[{job_id}] ✓ {len(unique)} unique slides")
         
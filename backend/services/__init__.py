@@ -6,11 +6,26 @@ from .frame_cleaner import FrameCleaner
 from .page_detector import PageDetector
 from .ocr_engine import OCREngine
 from .pdf_generator import PDFGenerator
+from .download_cache import DownloadCache
+from .frame_store import FrameStore, FrameHandle
+from .format_selector import FormatSelector
+from .frame_hasher import FrameHasher
+from .hash_index import HashIndex
+from .slide_cache import SlideCache
+from .slide_locator import SlideLocator
 
 __all__ = [
     'VideoProcessor',
     'FrameCleaner',
     'PageDetector',
     'OCREngine',
-    'PDFGenerator'
+    'PDFGenerator',
+    'DownloadCache',
+    'FrameStore',
+    'FrameHandle',
+    'FormatSelector',
+    'FrameHasher',
+    'HashIndex',
+    'SlideCache',
+    'SlideLocator'
 ]
@@ -0,0 +1,135 @@
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class DownloadCache:
+    """
+    Persistent, size-capped cache of downloaded videos.
+
+    Entries are keyed by yt-dlp video ID plus the selected format, so a
+    repeat extraction of the same video at the same quality skips the
+    network entirely. Least recently used entries are evicted once the
+    cache grows past max_bytes, except entries that jobs still reference.
+
+    Layout: <root>/<key>/video.<ext> plus a '.complete' marker whose mtime
+    records the last use. Reference counts live in memory, so they are
+    per-process (each server runs as a single process).
+    """
+
+    COMPLETE_MARKER = '.complete'
+
+    def __init__(self, root: Path, max_bytes: int = 20 * 1024 ** 3):
+        """
+        Initialize download cache.
+
+        Args:
+            root: Directory to keep cached videos in
+            max_bytes: Size cap before least recently used entries are evicted
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._refs: Dict[str, int] = {}
+        self._download_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(video_id: str, format_id: str) -> str:
+        """Build a filesystem-safe cache key from video ID and format."""
+        return re.sub(r'[^A-Za-z0-9_.+-]', '_', f"{video_id}-{format_id}")
+
+    def entry_dir(self, key: str) -> Path:
+        """Directory a cache entry is downloaded into."""
+        return self.root / key
+
+    def key_for(self, path: Path) -> Optional[str]:
+        """Return the cache key owning path, or None if it isn't cached."""
+        path = Path(path).resolve()
+        root = self.root.resolve()
+        if path.parent.parent != root:
+            return None
+        return path.parent.name
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """
+        Find a completed cache entry and mark it as recently used.
+
+        Returns:
+            Path to the cached video, or None on a miss
+        """
+        marker = self.entry_dir(key) / self.COMPLETE_MARKER
+        if not marker.exists():
+            return None
+
+        videos = [
+            path for path in self.entry_dir(key).glob('video.*')
+            if not path.name.endswith('.part')
+        ]
+        if not videos:
+            return None
+
+        marker.touch()
+        return videos[0]
+
+    def commit(self, key: str):
+        """Mark a downloaded entry as complete, then enforce the size cap."""
+        (self.entry_dir(key) / self.COMPLETE_MARKER).touch()
+        self.evict()
+
+    def download_lock(self, key: str) -> threading.Lock:
+        """Lock serializing lookup+download of one key across jobs."""
+        with self._lock:
+            return self._download_locks.setdefault(key, threading.Lock())
+
+    def acquire(self, key: str):
+        """Take a reference so the entry can't be evicted while in use."""
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 0) + 1
+
+    def release(self, key: str):
+        """Drop a reference taken with acquire."""
+        with self._lock:
+            count = self._refs.get(key, 0) - 1
+            if count > 0:
+                self._refs[key] = count
+            else:
+                self._refs.pop(key, None)
+        self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used, unreferenced entries until the cache fits
+        in max_bytes. Incomplete entries nobody references are leftovers of
+        failed downloads and are always removed.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+
+            for entry in self.root.iterdir():
+                if not entry.is_dir():
+                    continue
+
+                size = sum(f.stat().st_size for f in entry.rglob('*') if f.is_file())
+                marker = entry / self.COMPLETE_MARKER
+                last_used = marker.stat().st_mtime if marker.exists() else None
+
+                if last_used is None and entry.name not in self._refs:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    continue
+
+                total += size
+                entries.append((last_used or float('inf'), entry, size))
+
+            for _, entry, size in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                if entry.name in self._refs:
+                    continue
+
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FormatSelector:
+    """
+    Picks the smallest video-only format at which slide text stays legible.
+    
+    Candidate formats are probed lowest resolution first: a few frames are
+    decoded straight from the format URL (range requests, no download) and
+    OCR'd. The first resolution whose OCR confidence clears min_confidence
+    wins, so the pipeline only escalates to larger downloads when the text
+    actually needs it.
+    """
+    
+    def __init__(
+        self, ocr_engine, min_confidence: float = 0.6, probe_frames: int = 3
+    ):
+        """
+        Initialize format selector.
+        
+        Args:
+            ocr_engine: OCREngine used to score legibility
+            min_confidence: Mean OCR confidence (0-1) a resolution must reach
+            probe_frames: Frames sampled per candidate resolution
+        """
+        self.ocr_engine = ocr_engine
+        self.min_confidence = min_confidence
+        self.probe_frames = probe_frames
+    
+    def candidates(self, info: dict, max_height: int) -> List[dict]:
+        """
+        One probeable format per height up to max_height, lowest first.
+        
+        Video-only formats are preferred (the pipeline never uses audio),
+        then the smallest bitrate at each height.
+        """
+        best: Dict[int, dict] = {}
+        
+        for fmt in info.get('formats') or []:
+            height = fmt.get('height')
+            if not height or height > max_height:
+                continue
+            if fmt.get('vcodec') == 'none' or fmt.get('protocol') not in ('http', 'https'):
+                continue
+            
+            rank = (fmt.get('acodec') != 'none', fmt.get('tbr') or float('inf'))
+            current = best.get(height)
+            if current is None or rank < (
+                current.get('acodec') != 'none', current.get('tbr') or float('inf')
+            ):
+                best[height] = fmt
+        
+        return [best[height] for height in sorted(best)]
+    
+    async def select(self, info: dict, max_height: int) -> Optional[dict]:
+        """
+        Choose the format to download.
+        
+        Args:
+            info: yt-dlp info dict (with 'formats' and 'duration')
+            max_height: Highest resolution the caller allows
+        
+        Returns:
+            The chosen yt-dlp format dict, or None if nothing could be
+            probed (callers should fall back to their default format)
+        """
+        candidates = self.candidates(info, max_height)
+        if not candidates:
+            return None
+        
+        for fmt in candidates:
+            frames = await asyncio.to_thread(
+                self._probe, fmt['url'], info.get('duration')
+            )
+            if not frames:
+                logger.warning("Could not probe %sp, trying next resolution", fmt['height'])
+                continue
+            
+            try:
+                confidence = await self._legibility(frames)
+            except (OSError, RuntimeError) as e:
+                # Tesseract missing or broken: can't judge legibility
+                logger.warning("Legibility probe unavailable (%s), using default format", e)
+                return None
+            
+            logger.info("%sp OCR confidence: %.2f", fmt['height'], confidence)
+            if confidence >= self.min_confidence:
+                return fmt
+        
+        # Nothing was legible enough; take the largest allowed resolution
+        return candidates[-1]
+    
+    def _probe(self, url: str, duration: Optional[float]) -> List[np.ndarray]:
+        """Decode probe_frames frames spread across the video."""
+        cap = cv2.VideoCapture(url)
+        if not cap.isOpened():
+            return []
+        
+        try:
+            if not duration:
+                video_fps = cap.get(cv2.CAP_PROP_FPS)
+                total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                duration = total_frames / video_fps if video_fps > 0 else 0
+            
+            frames = []
+            for i in range(self.probe_frames):
+                # Skip the very start and end (title cards, black frames)
+                cap.set(cv2.CAP_PROP_POS_MSEC, 1000 * duration * (i + 1) / (self.probe_frames + 1))
+                ret, frame = cap.read()
+                if ret:
+                    frames.append(frame)
+            return frames
+        finally:
+            cap.release()
+    
+    async def _legibility(self, frames: List[np.ndarray]) -> float:
+        """Mean OCR confidence over the probe frames that contain text."""
+        scores = []
+        for frame in frames:
+            text, confidence = await self.ocr_engine.extract_text_with_confidence(frame)
+            if text:
+                scores.append(confidence)
+        
+        return sum(scores) / len(scores) if scores else 0.0
@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+from functools import cached_property
+from typing import Optional, Union
+
+
+# Width of the grayscale proxy that detection and quality scoring run on.
+# Large enough for sharpness/brightness metrics, small enough that every
+# sampled frame can afford one.
+PROXY_WIDTH = 320
+
+
+def make_proxy(frame: np.ndarray, width: int = PROXY_WIDTH) -> np.ndarray:
+    """
+    Create a cheap downscaled grayscale proxy of a frame.
+
+    Frames that are already grayscale and no wider than `width` are
+    returned unchanged, so calling this on a proxy is a no-op.
+
+    Args:
+        frame: BGR or grayscale frame
+        width: Maximum proxy width (aspect ratio is preserved)
+
+    Returns:
+        uint8 grayscale image at most `width` pixels wide
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    h, w = gray.shape[:2]
+    if w > width:
+        height = max(1, round(h * width / w))
+        gray = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+
+    return gray
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of the Laplacian: high for crisp text, low for blur."""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class FrameAnalysis:
+    """
+    Per-frame measurements, computed on first use and then memoized.
+
+    The quality check, face and overlay detection, cleaning validation and
+    page detection all need grayscale versions of the same frame. Passing
+    one FrameAnalysis between them converts the frame once instead of once
+    per call. Methods that take a frame accept either a raw array or a
+    FrameAnalysis (see FrameAnalysis.of).
+    """
+
+    def __init__(self, frame: np.ndarray, proxy: Optional[np.ndarray] = None):
+        """
+        Initialize frame analysis.
+
+        Args:
+            frame: BGR or grayscale frame
+            proxy: Precomputed make_proxy(frame), if the caller has one
+        """
+        self.frame = frame
+        if proxy is not None:
+            self.proxy = proxy
+        self._edges = {}
+        self._scaled = {}
+
+    @classmethod
+    def of(cls, frame: Union[np.ndarray, 'FrameAnalysis']) -> 'FrameAnalysis':
+        """Wrap a frame, or return it unchanged if it already is an analysis."""
+        return frame if isinstance(frame, cls) else cls(frame)
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        """Full-resolution grayscale frame."""
+        if self.frame.ndim == 2:
+            return self.frame
+        return cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def proxy(self) -> np.ndarray:
+        """Downscaled grayscale proxy (see make_proxy)."""
+        # make_proxy converts at full resolution anyway; keep that result
+        return make_proxy(self.gray)
+
+    def scaled(self, width: int) -> np.ndarray:
+        """Grayscale frame downscaled to at most width pixels, memoized."""
+        if width not in self._scaled:
+            self._scaled[width] = make_proxy(self.gray, width=width)
+        return self._scaled[width]
+
+    @cached_property
+    def brightness(self) -> float:
+        """Mean gray level of the proxy."""
+        return float(np.mean(self.proxy))
+
+    @cached_property
+    def sharpness(self) -> float:
+        """Laplacian variance of the proxy."""
+        return sharpness(self.proxy)
+
+    @cached_property
+    def full_sharpness(self) -> float:
+        """Laplacian variance of the full-resolution grayscale frame."""
+        # Downscaling hides blur, so absolute blur checks can't use the proxy
+        return sharpness(self.gray)
+
+    def edges(
+        self, x: int = 0, y: int = 0,
+        width: Optional[int] = None, height: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Canny edge map of a region (default: the whole frame), memoized.
+
+        Edges are computed per region rather than once for the whole frame,
+        since callers such as overlay detection only look at small corners.
+        """
+        region = (x, y, width, height)
+        if region not in self._edges:
+            h, w = self.gray.shape[:2]
+            roi = self.gray[y:h if height is None else y + height, x:w if width is None else x + width]
+            self._edges[region] = cv2.Canny(roi, 50, 150)
+        return self._edges[region]
@@ -1,9 +1,11 @@
 import cv2
 import numpy as np
 # import mediapipe as mp  # Temporarily disabled due to protobuf conflicts
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Union
 from dataclasses import dataclass
 
+from .frame_analysis import FrameAnalysis
+
 
 @dataclass
 class ObstructionRegion:
@@ -39,17 +41,36 @@ class FrameCleaner:
             cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         )
         
+        # Haar face detection runs on downscaled grayscale: the four corners
+        # (where facecams sit) at HAAR_CORNER_WIDTH, and only if they hold
+        # no face, the whole frame at the coarser HAAR_FULL_WIDTH, which is
+        # enough for a presenter filling the view. HAAR_CORNER is the
+        # fraction of width/height each corner region spans.
+        self.HAAR_CORNER_WIDTH = 640
+        self.HAAR_FULL_WIDTH = 320
+        self.HAAR_CORNER = (0.4, 0.45)
+        
         # Quality thresholds for self-correction
         self.MIN_BRIGHTNESS = 20
         self.MAX_BRIGHTNESS = 235
         self.MIN_SHARPNESS = 50
         self.MIN_FRAME_SIZE = (320, 240)
         
-    def is_low_quality(self, frame: np.ndarray) -> bool:
+    def is_low_quality(
+        self, frame: Union[np.ndarray, FrameAnalysis],
+        proxy: Optional[np.ndarray] = None
+    ) -> bool:
         """
         Agentic quality check: Determine if frame is too low quality to process.
         Returns True if frame should be skipped.
+        
+        Brightness is scored on the downscaled grayscale proxy (built from
+        the frame if not supplied). Sharpness is scored at full resolution,
+        since the proxy hides blur and MIN_SHARPNESS is tuned for full frames.
+        Pass a FrameAnalysis to reuse measurements other stages already made.
         """
+        analysis = frame if isinstance(frame, FrameAnalysis) else FrameAnalysis(frame, proxy)
+        frame = analysis.frame
         if frame is None or frame.size == 0:
             return True
         
@@ -59,28 +80,28 @@ class FrameCleaner:
             return True
         
         # Check brightness
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        mean_brightness = np.mean(gray)
+        mean_brightness = analysis.brightness
         if mean_brightness < self.MIN_BRIGHTNESS or mean_brightness > self.MAX_BRIGHTNESS:
             return True
         
         # Check sharpness using Laplacian variance
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        laplacian_var = analysis.full_sharpness
         if laplacian_var < self.MIN_SHARPNESS:
             return True
         
         return False
     
-    def is_valid_cleaned_frame(self, frame: np.ndarray) -> bool:
+    def is_valid_cleaned_frame(self, frame: Union[np.ndarray, FrameAnalysis]) -> bool:
         """
         Agentic validation: Verify that cleaning didn't corrupt the frame.
         Returns True if the cleaned frame is valid.
         """
-        if frame is None or frame.size == 0:
+        analysis = FrameAnalysis.of(frame)
+        if analysis.frame is None or analysis.frame.size == 0:
             return False
         
         # Check for excessive black/white areas (sign of bad inpainting)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = analysis.gray
         black_pixels = np.sum(gray < 10)
         white_pixels = np.sum(gray > 245)
         total_pixels = gray.size
@@ -91,16 +112,34 @@ class FrameCleaner:
         
         return True
     
-    async def remove_obstructions(self, frame: np.ndarray) -> np.ndarray:
+    def tracker(self) -> 'ObstructionTracker':
+        """Start tracking obstructions across one video (see ObstructionTracker)."""
+        return ObstructionTracker(self)
+    
+    async def remove_obstructions(
+        self, frame: Union[np.ndarray, FrameAnalysis],
+        tracker: Optional['ObstructionTracker'] = None
+    ) -> np.ndarray:
         """
         Main cleaning function: Detects and removes obstructions from frame.
         Uses multiple detection methods and self-corrects if needed.
+        
+        Accepts a FrameAnalysis so the quality check and detectors share
+        one grayscale conversion; the (possibly unchanged) frame array is
+        returned either way. With a tracker, the video's confirmed
+        obstructions are reused instead of detecting on every page.
         """
-        if self.is_low_quality(frame):
+        analysis = FrameAnalysis.of(frame)
+        frame = analysis.frame
+        
+        if self.is_low_quality(analysis):
             return frame
         
         # Detect all obstructions
-        obstructions = self._detect_all_obstructions(frame)
+        if tracker is not None:
+            obstructions = tracker.obstructions(analysis)
+        else:
+            obstructions = self._detect_all_obstructions(analysis)
         
         if not obstructions:
             return frame
@@ -123,8 +162,11 @@ class FrameCleaner:
         
         return cleaned_frame
     
-    def _detect_all_obstructions(self, frame: np.ndarray) -> List[ObstructionRegion]:
+    def _detect_all_obstructions(
+        self, frame: Union[np.ndarray, FrameAnalysis]
+    ) -> List[ObstructionRegion]:
         """Detect all types of obstructions in the frame."""
+        frame = FrameAnalysis.of(frame)
         obstructions = []
         
         # 1. Detect faces using Mediapipe (DISABLED)
@@ -146,14 +188,24 @@ class FrameCleaner:
         # Disabled due to protobuf conflicts
         return []
     
-    def _detect_faces_haar(self, frame: np.ndarray) -> List[ObstructionRegion]:
-        """Fallback face detection using Haar Cascade."""
+    def _detect_faces_haar(
+        self, frame: Union[np.ndarray, FrameAnalysis]
+    ) -> List[ObstructionRegion]:
+        """
+        Fallback face detection using Haar Cascade.
+        
+        Searches the corners first, then the whole frame only if no corner
+        holds a face, each on a downscaled image (see HAAR_* above); boxes
+        are scaled back to frame coordinates.
+        """
         obstructions = []
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        analysis = FrameAnalysis.of(frame)
+        frame_h, frame_w = analysis.gray.shape[:2]
         
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-        )
+        faces = self._detect_corner_faces(analysis.scaled(self.HAAR_CORNER_WIDTH), frame_w)
+        if not faces:
+            small = analysis.scaled(self.HAAR_FULL_WIDTH)
+            faces = self._haar_boxes(small, 0, 0, frame_w / small.shape[1])
         
         for (x, y, w, h) in faces:
             # Expand to include body
@@ -171,13 +223,44 @@ class FrameCleaner:
         
         return obstructions
     
-    def _detect_overlays(self, frame: np.ndarray) -> List[ObstructionRegion]:
+    def _detect_corner_faces(self, small: np.ndarray, frame_w: int) -> List[tuple]:
+        """Haar faces in the four corner regions of a downscaled frame."""
+        h, w = small.shape[:2]
+        corner_w, corner_h = int(w * self.HAAR_CORNER[0]), int(h * self.HAAR_CORNER[1])
+        scale = frame_w / w
+        
+        faces = []
+        for x in (0, w - corner_w):
+            for y in (0, h - corner_h):
+                faces.extend(self._haar_boxes(
+                    small[y:y + corner_h, x:x + corner_w], x, y, scale
+                ))
+        return faces
+    
+    def _haar_boxes(
+        self, gray: np.ndarray, offset_x: int, offset_y: int, scale: float
+    ) -> List[tuple]:
+        """Run the cascade on a region; boxes in full-frame coordinates."""
+        # 24x24 is the cascade's native window, the smallest face it finds
+        faces = self.face_cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24)
+        )
+        return [
+            (int((x + offset_x) * scale), int((y + offset_y) * scale),
+             int(w * scale), int(h * scale))
+            for (x, y, w, h) in faces
+        ]
+    
+    def _detect_overlays(
+        self, frame: Union[np.ndarray, FrameAnalysis]
+    ) -> List[ObstructionRegion]:
         """
         Detect common overlay regions like social media handles, logos.
         These are typically in corners or bottom of frame.
         """
+        analysis = FrameAnalysis.of(frame)
         obstructions = []
-        h, w = frame.shape[:2]
+        h, w = analysis.frame.shape[:2]
         
         # Define common overlay regions (relative to frame size)
         overlay_regions = [
@@ -190,11 +273,8 @@ class FrameCleaner:
         ]
         
         for x, y, width, height in overlay_regions:
-            roi = frame[y:y+height, x:x+width]
-            
             # Check if region has text/graphics (high edge density)
-            gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray_roi, 50, 150)
+            edges = analysis.edges(x, y, width, height)
             edge_density = np.sum(edges > 0) / edges.size
             
             # If edge density is high, likely an overlay
@@ -309,3 +389,176 @@ class FrameCleaner:
             ] = blurred
         
         return cleaned
+
+
+class ObstructionTracker:
+    """
+    Video-level obstruction model.
+    
+    Facecams, logos and handles sit in the same place for the whole video,
+    so detecting them on every page is wasted work. The tracker keeps the
+    detections of the last SAMPLES fully detected pages and confirms the
+    regions found on at least CONFIRMATIONS of them; one-off detections,
+    such as a photo on a slide, are dropped. Pages in between reuse the
+    confirmed regions.
+    
+    A page is detected in full (and cleaned with its own detections) when
+    a cheap change signal fires: the mean or contrast on the grayscale
+    proxy of a confirmed region or of one of the four corners, where
+    facecams appear, differs from the last detected page. The frame size
+    changing also triggers detection, so after SAMPLES clean pages (most
+    videos have no facecam or overlay) nothing is detected again unless a
+    corner changes. Only while the model is provisional (the last detected
+    page has a detection that wasn't confirmed, e.g. a facecam Haar missed
+    on earlier pages, which the change signal can't see since it is part
+    of the baseline) a page is also detected at least every REDETECT_EVERY
+    pages.
+    """
+    
+    # Detected pages the model is built from, and how many of them a
+    # region must be found on to be confirmed
+    SAMPLES = 3
+    CONFIRMATIONS = 2
+    
+    # Regions found on different pages are the same obstruction above this
+    # intersection over union
+    MATCH_IOU = 0.5
+    
+    # Change in a region's proxy mean or standard deviation (gray levels)
+    # that triggers re-detection
+    STAT_DELTA = 20.0
+    
+    # Corner patches (fraction of width, height) watched for facecams or
+    # logos appearing; slide margins usually keep them empty
+    CORNER = (0.15, 0.2)
+    
+    # Pages a provisional model is reused for before detecting again
+    REDETECT_EVERY = 5
+    
+    def __init__(self, cleaner: FrameCleaner):
+        """
+        Initialize obstruction tracker.
+        
+        Args:
+            cleaner: FrameCleaner providing the detectors
+        """
+        self.cleaner = cleaner
+        self.samples: List[List[ObstructionRegion]] = []
+        self.shape = None
+        self.regions: Optional[List[ObstructionRegion]] = None
+        self.provisional = True
+        self.stats: List[Tuple[float, float]] = []
+        self.reused = 0
+        self.detections = 0
+    
+    def obstructions(
+        self, frame: Union[np.ndarray, FrameAnalysis]
+    ) -> List[ObstructionRegion]:
+        """
+        Obstructions of a page, detected or reused from the model.
+        
+        Args:
+            frame: The page, or its FrameAnalysis to reuse its proxy
+            
+        Returns:
+            Merged obstruction regions in frame coordinates
+        """
+        analysis = FrameAnalysis.of(frame)
+        
+        if self.regions is not None and self._unchanged(analysis):
+            if not self.provisional or self.reused < self.REDETECT_EVERY - 1:
+                self.reused += 1
+                return self.regions
+        
+        if analysis.frame.shape[:2] != self.shape:
+            # Regions of another frame size don't apply: start over
+            self.samples, self.regions = [], None
+            self.shape = analysis.frame.shape[:2]
+        
+        detected = self.cleaner._detect_all_obstructions(analysis)
+        self.detections += 1
+        self.samples = (self.samples + [detected])[-self.SAMPLES:]
+        
+        if len(self.samples) == self.SAMPLES:
+            self.regions, self.provisional = self._confirm()
+            self.stats = self._stats(analysis)
+            self.reused = 0
+        
+        return detected
+    
+    def _confirm(self) -> Tuple[List[ObstructionRegion], bool]:
+        """
+        Regions found on enough samples, each merged across them.
+        
+        Returns:
+            (confirmed regions, provisional) tuple; the model is provisional
+            if a detection on the latest sample wasn't confirmed. One-off
+            detections on earlier samples are dropped: they are gone from
+            the page the change signal compares against.
+        """
+        confirmed = []
+        for i, sample in enumerate(self.samples):
+            for region in sample:
+                if any(self._iou(region, other) >= self.MATCH_IOU for other in confirmed):
+                    continue
+                
+                matches = [region] + [
+                    other
+                    for later in self.samples[i + 1:]
+                    for other in later
+                    if self._iou(region, other) >= self.MATCH_IOU
+                ]
+                if len(matches) >= self.CONFIRMATIONS:
+                    merged = matches[0]
+                    for other in matches[1:]:
+                        merged = self.cleaner._merge_two_regions(merged, other)
+                    confirmed.append(merged)
+        
+        unconfirmed = any(
+            not any(self.cleaner._regions_overlap(region, other) for other in confirmed)
+            for region in self.samples[-1]
+        )
+        return self.cleaner._merge_overlapping_regions(confirmed), unconfirmed
+    
+    def _stats(self, analysis: FrameAnalysis) -> List[Tuple[float, float]]:
+        """Proxy stats of the confirmed regions and of the four corners."""
+        h, w = analysis.frame.shape[:2]
+        corner_w, corner_h = int(w * self.CORNER[0]), int(h * self.CORNER[1])
+        corners = [
+            ObstructionRegion(x=x, y=y, width=corner_w, height=corner_h, confidence=0.0, type='corner')
+            for x in (0, w - corner_w) for y in (0, h - corner_h)
+        ]
+        return [self._region_stats(analysis, region) for region in self.regions + corners]
+    
+    def _unchanged(self, analysis: FrameAnalysis) -> bool:
+        """Cheap check that confirmed regions and corners still look the same."""
+        if analysis.frame.shape[:2] != self.shape:
+            return False
+        
+        for (mean, std), (new_mean, new_std) in zip(self.stats, self._stats(analysis)):
+            if abs(new_mean - mean) > self.STAT_DELTA or abs(new_std - std) > self.STAT_DELTA:
+                return False
+        return True
+    
+    def _region_stats(
+        self, analysis: FrameAnalysis, region: ObstructionRegion
+    ) -> Tuple[float, float]:
+        """Mean and standard deviation of a region on the proxy."""
+        proxy = analysis.proxy
+        scale = proxy.shape[1] / analysis.frame.shape[1]
+        x0, y0 = int(region.x * scale), int(region.y * scale)
+        x1 = max(x0 + 1, int((region.x + region.width) * scale))
+        y1 = max(y0 + 1, int((region.y + region.height) * scale))
+        
+        mean, std = cv2.meanStdDev(proxy[y0:y1, x0:x1])
+        return float(mean[0, 0]), float(std[0, 0])
+    
+    def _iou(self, r1: ObstructionRegion, r2: ObstructionRegion) -> float:
+        """Intersection over union of two regions."""
+        width = min(r1.x + r1.width, r2.x + r2.width) - max(r1.x, r2.x)
+        height = min(r1.y + r1.height, r2.y + r2.height) - max(r1.y, r2.y)
+        if width <= 0 or height <= 0:
+            return 0.0
+        
+        intersection = width * height
+        return intersection / (r1.width * r1.height + r2.width * r2.height - intersection)
@@ -0,0 +1,126 @@
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class FrameHandle:
+    """Lightweight reference to a frame kept in a FrameStore."""
+    page_id: int
+    timestamp: float
+    shape: Tuple[int, ...]
+    offset: int
+
+
+class FrameStore:
+    """
+    Append-only on-disk frame store read back through memory mapping.
+
+    Pipeline stages pass FrameHandles around instead of full frames, so
+    resident memory stays bounded no matter how many pages a video has.
+    Reads return read-only np.memmap views: the OS pages pixels in on
+    demand and nothing is copied into Python. put() may be called from
+    several threads (e.g. a detector thread and the cleaning stage).
+
+    The file is mapped once and views are slices of that mapping, since
+    every mapping holds its own file descriptor. The file grows in doubling
+    steps of spare capacity, so it is only re-mapped a few times however
+    many pages are added.
+    """
+
+    # Capacity reserved (sparsely) when the file is first written to
+    INITIAL_CAPACITY = 64 * 1024 ** 2
+
+    def __init__(self, path: Path, index: Optional[List[FrameHandle]] = None):
+        """
+        Initialize frame store.
+
+        Args:
+            path: File to store raw uint8 frame data in (created/truncated)
+            index: Handles of an existing store file to open instead, e.g.
+                one filled in a worker process; new frames are appended
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._file = open(self.path, 'w+b' if index is None else 'r+b')
+        self.index: List[FrameHandle] = list(index or [])
+        self._size = max(
+            (handle.offset + int(np.prod(handle.shape)) for handle in self.index), default=0
+        )
+        self._capacity = self.path.stat().st_size
+        self._map: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    def put(
+        self, frame: np.ndarray, timestamp: float = 0.0,
+        page_id: Optional[int] = None
+    ) -> FrameHandle:
+        """
+        Append a frame to the store.
+
+        Args:
+            frame: uint8 image (BGR or grayscale)
+            timestamp: Video timestamp of the frame
+            page_id: Page the frame belongs to (default: next free id)
+
+        Returns:
+            Handle to read the frame back with get()
+        """
+        data = np.ascontiguousarray(frame, dtype=np.uint8)
+
+        with self._lock:
+            handle = FrameHandle(
+                page_id=len(self.index) if page_id is None else page_id,
+                timestamp=timestamp,
+                shape=data.shape,
+                offset=self._size
+            )
+
+            if self._size + data.nbytes > self._capacity:
+                self._capacity = max(
+                    2 * self._capacity, self._size + data.nbytes, self.INITIAL_CAPACITY
+                )
+                self._file.truncate(self._capacity)
+
+            self._file.seek(handle.offset)
+            self._file.write(memoryview(data).cast('B'))
+            self._file.flush()
+            self._size += data.nbytes
+
+            self.index.append(handle)
+        return handle
+
+    def get(self, handle: FrameHandle) -> np.ndarray:
+        """Return a zero-copy, read-only view of a stored frame."""
+        nbytes = int(np.prod(handle.shape))
+
+        with self._lock:
+            if self._map is None or len(self._map) < handle.offset + nbytes:
+                # Views of the previous mapping keep it alive until dropped
+                self._map = np.memmap(
+                    self.path, dtype=np.uint8, mode='r', shape=(self._capacity,)
+                )
+            mapping = self._map
+
+        return mapping[handle.offset:handle.offset + nbytes].reshape(handle.shape)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[FrameHandle]:
+        return iter(self.index)
+
+    def close(self):
+        """Close the backing file (views already handed out stay valid)."""
+        if not self._file.closed:
+            self._file.close()
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from .frame_hasher import hamming_distance
+
+
+class PageRecord:
+    """Compact record of an indexed page: its packed pHash plus metadata."""
+    __slots__ = ('page_id', 'hash_value', 'timestamp')
+    
+    def __init__(self, page_id: int, hash_value: int, timestamp: float = 0.0):
+        self.page_id = page_id
+        self.hash_value = hash_value
+        self.timestamp = timestamp
+    
+    def __repr__(self) -> str:
+        return f"PageRecord(page_id={self.page_id}, hash_value={self.hash_value:#018x})"
+
+
+class HashIndex:
+    """
+    Multi-index hashing over packed uint64 page hashes.
+    
+    The 64 hash bits are split into max_distance + 1 disjoint chunks. Two
+    hashes within max_distance bits of each other must agree exactly on at
+    least one chunk (pigeonhole), so a query only verifies pages that share
+    a chunk with it. Candidates are verified with one vectorized popcount
+    over the array-backed hash column instead of per-object comparisons.
+    
+    When chunks would be too narrow to be selective (large max_distance),
+    queries fall back to a vectorized scan of every hash, which is still
+    a single NumPy call.
+    """
+    
+    HASH_BITS = 64
+    
+    # Chunks narrower than this match too often to be worth indexing
+    MIN_CHUNK_BITS = 4
+    
+    def __init__(self, max_distance: int = 5):
+        """
+        Initialize hash index.
+        
+        Args:
+            max_distance: Largest Hamming distance queries have to find
+        """
+        self.max_distance = max_distance
+        
+        self.records: List[PageRecord] = []
+        self._hashes = np.zeros(64, dtype=np.uint64)
+        
+        chunks = max_distance + 1
+        if self.HASH_BITS // chunks >= self.MIN_CHUNK_BITS:
+            bounds = np.linspace(0, self.HASH_BITS, chunks + 1).astype(int)
+            self._chunks: List[Tuple[int, int]] = [
+                (int(start), (1 << int(end - start)) - 1)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]
+        else:
+            self._chunks = []
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._chunks]
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    @property
+    def hashes(self) -> np.ndarray:
+        """uint64 array of every indexed hash, in insertion order."""
+        return self._hashes[:len(self.records)]
+    
+    def add(
+        self, hash_value: int, page_id: Optional[int] = None, timestamp: float = 0.0
+    ) -> PageRecord:
+        """
+        Index a page hash.
+        
+        Args:
+            hash_value: Packed uint64 pHash
+            page_id: Page identifier (default: insertion position)
+            timestamp: Video timestamp of the page
+        
+        Returns:
+            The stored PageRecord
+        """
+        position = len(self.records)
+        hash_value = int(hash_value)
+        
+        if position == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[position] = hash_value
+        
+        for (shift, mask), table in zip(self._chunks, self._tables):
+            table.setdefault((hash_value >> shift) & mask, []).append(position)
+        
+        record = PageRecord(position if page_id is None else page_id, hash_value, timestamp)
+        self.records.append(record)
+        return record
+    
+    def query(
+        self, hash_value: int, max_distance: Optional[int] = None
+    ) -> List[Tuple[PageRecord, int]]:
+        """
+        Find indexed pages within max_distance bits of a hash.
+        
+        Args:
+            hash_value: Packed uint64 pHash to look up
+            max_distance: Search radius (default and upper bound: the
+                index's max_distance)
+        
+        Returns:
+            (record, distance) pairs, nearest first
+        """
+        if not self.records:
+            return []
+        
+        radius = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        hash_value = int(hash_value)
+        
+        if self._chunks:
+            candidates = set()
+            for (shift, mask), table in zip(self._chunks, self._tables):
+                candidates.update(table.get((hash_value >> shift) & mask, ()))
+            if not candidates:
+                return []
+            positions = np.sort(np.fromiter(candidates, dtype=np.int64, count=len(candidates)))
+        else:
+            positions = np.arange(len(self.records))
+        
+        distances = hamming_distance(hash_value, self._hashes[positions])
+        hits = np.flatnonzero(distances <= radius)
+        hits = hits[np.argsort(distances[hits], kind='stable')]
+        
+        return [(self.records[positions[i]], int(distances[i])) for i in hits]
+    
+    def nearest(self, hash_value: int) -> Optional[Tuple[PageRecord, int]]:
+        """Closest indexed page within max_distance, or None."""
+        matches = self.query(hash_value)
+        return matches[0] if matches else None
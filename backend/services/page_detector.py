@@ -1,18 +1,28 @@
 import cv2
 import numpy as np
 import imagehash
-from PIL import Image
-from typing import List, Tuple
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 
+from .frame_analysis import FrameAnalysis, make_proxy
+from .frame_hasher import FrameHasher, hamming_distance, unpack_hash
+from .frame_store import FrameHandle, FrameStore
+from .hash_index import HashIndex
+
+
+# Items are (frame, timestamp) or (frame, timestamp, proxy) tuples
+FrameSource = Union[Iterable[tuple], AsyncIterable[tuple]]
+
 
 @dataclass
 class FrameInfo:
     """Information about a detected frame/page."""
-    frame: np.ndarray
+    frame: Union[np.ndarray, FrameHandle]
     timestamp: float
-    hash_value: str
+    hash_value: int
     difference_score: float
+    # Grayscale proxy of the frame, for later stages to reuse
+    proxy: Optional[np.ndarray] = None
 
 
 class PageDetector:
@@ -21,130 +31,306 @@ class PageDetector:
     Detects when slides change while ignoring minor movements, cursor flickers, etc.
     """
     
+    # Frame differencing runs on a thumbnail this wide, split into a
+    # DIFF_GRID x DIFF_GRID grid of cells. A pixel counts as changed when
+    # its gray level moves by more than PIXEL_DELTA (above codec noise).
+    THUMBNAIL_WIDTH = 160
+    DIFF_GRID = 16
+    PIXEL_DELTA = 32
+    
+    # Frames outside this mean gray level are over/under-exposed (fades,
+    # transitions) and only kept as a page's frame if nothing better exists.
+    # Same bounds as FrameCleaner's quality check.
+    MIN_BRIGHTNESS = 20
+    MAX_BRIGHTNESS = 235
+    
+    # A page is a build step of the next one if the ink it loses (cursor,
+    # antialiasing) is at most this fraction of the ink the next one adds
+    BUILD_TOLERANCE = 0.1
+    
+    # Slide mask estimation: a DIFF_GRID cell that changes between at least
+    # DYNAMIC_CHANGE_RATE of sample pairs one second apart (facecam,
+    # animated overlay) is dynamic; slide cells only change at the rare
+    # pairs that straddle a slide change. If more than MAX_MASKED_FRACTION
+    # of the frame is dynamic the video isn't a slide recording and no
+    # mask is used.
+    DYNAMIC_CHANGE_RATE = 0.25
+    MAX_MASKED_FRACTION = 0.5
+    
+    # Fewer sample pairs than this can't tell a facecam from a busy deck
+    MIN_MASK_PAIRS = 8
+    
     def __init__(
         self,
         hash_threshold: int = 10,
         diff_threshold: float = 0.15,
-        min_page_duration: float = 2.0
+        min_page_duration: float = 2.0,
+        collapse_builds: bool = True
     ):
         """
         Initialize page detector with configurable thresholds.
         
         Args:
             hash_threshold: Hamming distance threshold for pHash comparison (lower = more similar)
-            diff_threshold: Frame difference threshold (0-1, higher = more different)
+            diff_threshold: Frame difference threshold (0-1, higher = more different),
+                the changed-pixel fraction of the most changed thumbnail cell
             min_page_duration: Minimum duration (seconds) a page must be shown
+            collapse_builds: Merge progressive builds (bullets revealed one
+                at a time) into one page showing the final state
         """
         self.hash_threshold = hash_threshold
         self.diff_threshold = diff_threshold
         self.min_page_duration = min_page_duration
+        self.collapse_builds = collapse_builds
+        self.hasher = FrameHasher('phash')
         
     async def detect_unique_pages(
-        self, frames: List[Tuple[np.ndarray, float]]
-    ) -> List[np.ndarray]:
+        self, frames: FrameSource, store: Optional[FrameStore] = None
+    ) -> List[Union[np.ndarray, FrameHandle]]:
         """
-        Detect unique pages from a list of frames.
+        Detect unique pages from a sequence of frames.
+        
+        Frames are consumed one at a time, so passing a generator such as
+        VideoProcessor.iter_frames/stream_frames keeps memory proportional
+        to the number of detected pages rather than the video length.
+        Hashing runs on the low-res grayscale proxy; the full-resolution
+        frame is only kept for the current page candidate.
         
         Args:
-            frames: List of (frame, timestamp) tuples
+            frames: List, iterator or async iterator of (frame, timestamp)
+                or (frame, timestamp, proxy) tuples
+            store: Optional on-disk FrameStore; pages are written there as
+                soon as they are detected and handles returned instead
             
         Returns:
-            List of unique page frames
+            List of unique page frames, or FrameHandles if store is given
         """
-        if not frames:
-            return []
-        
+        session = self.session(store)
         unique_pages = []
-        last_page_hash = None
-        last_page_time = 0
-        candidate_page = None
-        candidate_time = 0
-        
-        for frame, timestamp in frames:
-            # Calculate perceptual hash
-            current_hash = self._calculate_phash(frame)
-            
-            # First frame
-            if last_page_hash is None:
-                last_page_hash = current_hash
-                last_page_time = timestamp
-                candidate_page = frame
-                candidate_time = timestamp
-                continue
-            
-            # Compare with last detected page
-            is_different = self._is_different_page(
-                frame, current_hash, last_page_hash
-            )
-            
-            if is_different:
-                # Check if candidate page was shown long enough
-                if candidate_page is not None:
-                    duration = timestamp - candidate_time
-                    if duration >= self.min_page_duration:
-                        unique_pages.append(candidate_page)
-                        last_page_hash = current_hash
-                        last_page_time = timestamp
-                
-                # Set new candidate
-                candidate_page = frame
-                candidate_time = timestamp
-            else:
-                # Same page, update candidate to latest (best quality) frame
-                candidate_page = frame
+        
+        async for frame, timestamp, proxy in self._iterate_frames(frames):
+            unique_pages.extend(page.frame for page in session.push(frame, timestamp, proxy))
         
         # Add the last candidate if it was shown long enough
-        if candidate_page is not None and len(frames) > 0:
-            last_timestamp = frames[-1][1]
-            duration = last_timestamp - candidate_time
-            if duration >= self.min_page_duration:
-                unique_pages.append(candidate_page)
+        unique_pages.extend(page.frame for page in session.flush())
         
         return unique_pages
     
-    def _calculate_phash(self, frame: np.ndarray) -> imagehash.ImageHash:
-        """Calculate perceptual hash of a frame."""
-        # Convert to PIL Image
-        if len(frame.shape) == 3:
-            # BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        else:
-            frame_rgb = frame
+    def session(
+        self, store: Optional[FrameStore] = None,
+        dedupe_threshold: Optional[int] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> 'PageDetectionSession':
+        """
+        Start an incremental detection session (see PageDetectionSession).
         
-        pil_image = Image.fromarray(frame_rgb)
+        Args:
+            store: Optional on-disk FrameStore to write finished pages to
+            dedupe_threshold: Also drop pages within this Hamming distance
+                of an earlier page, e.g. slides the lecturer went back to
+            mask: Slide mask from estimate_slide_mask; only the masked
+                region is hashed and differenced
+            
+        Returns:
+            A new session using this detector's thresholds
+        """
+        return PageDetectionSession(self, store, dedupe_threshold, mask)
+    
+    def estimate_slide_mask(
+        self, pairs: Sequence[Tuple[np.ndarray, np.ndarray]]
+    ) -> Optional[np.ndarray]:
+        """
+        Estimate which part of the frame shows the slide, once per video.
+        
+        Slides change a few times a minute; a facecam or animated overlay
+        changes between almost any two frames a second apart. Cells that
+        change in at least DYNAMIC_CHANGE_RATE of the sample pairs (grown
+        by one cell to cover their edges) are excluded from the mask.
+        
+        Args:
+            pairs: (proxy, proxy) pairs about a second apart, spread across
+                the video (see VideoProcessor.sample_proxy_pairs)
+            
+        Returns:
+            DIFF_GRID x DIFF_GRID boolean mask, True where the slide is, or
+            None if nothing is dynamic (or nearly everything is, or there
+            are too few pairs to tell)
+        """
+        if len(pairs) < self.MIN_MASK_PAIRS:
+            return None
+        
+        changes = np.zeros((self.DIFF_GRID, self.DIFF_GRID), dtype=np.float32)
+        for proxy_a, proxy_b in pairs:
+            changes += self._changed_cells(
+                make_proxy(proxy_a, width=self.THUMBNAIL_WIDTH),
+                make_proxy(proxy_b, width=self.THUMBNAIL_WIDTH)
+            ) > 0
+        
+        dynamic = (changes / len(pairs)) >= self.DYNAMIC_CHANGE_RATE
+        if not dynamic.any():
+            return None
         
-        # Calculate perceptual hash
-        return imagehash.phash(pil_image, hash_size=8)
+        dynamic = cv2.dilate(dynamic.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+        if dynamic.mean() > self.MAX_MASKED_FRACTION:
+            return None
+        
+        return ~dynamic
+    
+    def apply_mask(self, proxy: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Blank out everything outside the slide mask.
+        
+        Masked-out pixels are set to the median slide level, so they hash
+        and difference as flat background whatever the facecam shows.
+        """
+        if mask is None:
+            return proxy
+        
+        h, w = proxy.shape[:2]
+        inside = cv2.resize(mask.astype(np.uint8), (w, h), interpolation=cv2.INTER_NEAREST)
+        inside = inside.astype(bool)
+        
+        masked = proxy.copy()
+        masked[~inside] = np.median(proxy[inside])
+        return masked
+    
+    @staticmethod
+    async def _iterate_frames(
+        frames: FrameSource
+    ) -> AsyncIterator[Tuple[np.ndarray, float, np.ndarray]]:
+        """
+        Iterate over a sync or async frame source as (frame, timestamp, proxy),
+        building the proxy for sources that don't provide one.
+        """
+        def with_proxy(item):
+            if len(item) > 2:
+                return item[0], item[1], item[2]
+            return item[0], item[1], make_proxy(item[0])
+        
+        if hasattr(frames, '__aiter__'):
+            async for item in frames:
+                yield with_proxy(item)
+        else:
+            for item in frames:
+                yield with_proxy(item)
+    
+    def _calculate_phash(self, frame: np.ndarray) -> imagehash.ImageHash:
+        """
+        Calculate perceptual hash of a frame as an imagehash.ImageHash.
+        
+        Accepts a full frame or its proxy; either way the hash is computed
+        on the small grayscale proxy rather than the full-res BGR image.
+        Detection itself uses the packed uint64 from self.hasher directly.
+        """
+        return imagehash.ImageHash(unpack_hash(self.hasher.hash(frame)))
+    
+    def is_page_change(
+        self, proxy_a: np.ndarray, proxy_b: np.ndarray,
+        mask: Optional[np.ndarray] = None
+    ) -> bool:
+        """
+        Check whether two frames (or their proxies) show different pages.
+        Used by VideoProcessor to decide where adaptive sampling bisects.
+        Only the region inside mask (see estimate_slide_mask) is compared.
+        """
+        proxy_a = self.apply_mask(make_proxy(proxy_a), mask)
+        proxy_b = self.apply_mask(make_proxy(proxy_b), mask)
+        hash_a, hash_b = self.hasher.hash_batch([proxy_a, proxy_b])
+        return self._is_different_page(
+            make_proxy(proxy_b, width=self.THUMBNAIL_WIDTH), hash_b, hash_a,
+            make_proxy(proxy_a, width=self.THUMBNAIL_WIDTH)
+        )
     
     def _is_different_page(
         self,
-        frame: np.ndarray,
-        current_hash: imagehash.ImageHash,
-        last_hash: imagehash.ImageHash
+        thumbnail: np.ndarray,
+        current_hash: int,
+        last_hash: int,
+        last_thumbnail: Optional[np.ndarray] = None,
+        previous_thumbnail: Optional[np.ndarray] = None
     ) -> bool:
         """
         Determine if current frame represents a different page.
         Uses both perceptual hashing and frame differencing.
         """
-        # Method 1: Perceptual hash comparison
-        hash_distance = current_hash - last_hash
+        change = self._classify_change(
+            thumbnail, current_hash, last_hash, last_thumbnail, previous_thumbnail
+        )
+        return change in ('changed', 'settled')
+    
+    def _classify_change(
+        self,
+        thumbnail: np.ndarray,
+        current_hash: int,
+        last_hash: int,
+        last_thumbnail: Optional[np.ndarray] = None,
+        previous_thumbnail: Optional[np.ndarray] = None
+    ) -> str:
+        """
+        Classify the current frame against the current page.
+        
+        Args:
+            thumbnail: Diff thumbnail of the current frame
+            current_hash: Packed pHash of the current frame
+            last_hash: Packed pHash of the current page
+            last_thumbnail: Diff thumbnail of the current page
+            previous_thumbnail: Diff thumbnail of the previous sample, used
+                to ignore changes still in motion (optional)
+            
+        Returns:
+            'same' - still the current page
+            'changed' - a new page (pHash moved past hash_threshold)
+            'settled' - a new page found by differencing, which was already
+                on screen at the previous sample
+            'changing' - differs from the page but is still in motion
+        """
+        # Method 1: Perceptual hash comparison (packed uint64 pHashes)
+        hash_distance = hamming_distance(current_hash, last_hash)
         
         if hash_distance > self.hash_threshold:
-            return True
+            return 'changed'
         
         # Method 2: Frame differencing (for subtle changes)
-        # This is a secondary check for edge cases
-        # Note: We'd need to store the last frame for this, which we're not doing
-        # to save memory. The hash method is usually sufficient.
+        # Catches small edits such as one new bullet, and slide changes too
+        # similar for pHash. Runs on thumbnails, so its cost is bounded.
+        if last_thumbnail is None:
+            return 'same'
+        
+        if self._calculate_frame_difference(thumbnail, last_thumbnail) <= self.diff_threshold:
+            return 'same'
+        
+        # Only count a change once it has settled: cursor or presenter
+        # motion still differs from the previous sample, a new page doesn't
+        if previous_thumbnail is None:
+            return 'changed'
+        if self._calculate_frame_difference(thumbnail, previous_thumbnail) <= self.diff_threshold:
+            return 'settled'
+        return 'changing'
+    
+    def _quality_score(
+        self, frame: Union[np.ndarray, FrameAnalysis]
+    ) -> Tuple[bool, float]:
+        """
+        Rank a frame as a page's representative frame (higher is better).
         
-        return False
+        Args:
+            frame: FrameAnalysis of the frame, or its grayscale proxy
+            
+        Returns:
+            (well exposed, sharpness) tuple, compared lexicographically
+        """
+        analysis = FrameAnalysis.of(frame)
+        exposed = self.MIN_BRIGHTNESS <= analysis.brightness <= self.MAX_BRIGHTNESS
+        return exposed, analysis.sharpness
     
     def _calculate_frame_difference(
         self, frame1: np.ndarray, frame2: np.ndarray
     ) -> float:
         """
         Calculate normalized difference between two frames.
-        Returns value between 0 (identical) and 1 (completely different).
+        Returns value between 0 (identical) and 1 (completely different):
+        the fraction of changed pixels in the most changed grid cell, so a
+        small localized edit scores as high as it would on its own.
         """
         # Resize to same size if needed
         if frame1.shape != frame2.shape:
@@ -156,24 +342,62 @@ class PageDetector:
         gray1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY) if len(frame1.shape) == 3 else frame1
         gray2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY) if len(frame2.shape) == 3 else frame2
         
-        # Calculate absolute difference
-        diff = cv2.absdiff(gray1, gray2)
+        # Changed fraction per grid cell, worst cell wins
+        return float(self._changed_cells(gray1, gray2).max())
+    
+    def _changed_cells(self, gray1: np.ndarray, gray2: np.ndarray) -> np.ndarray:
+        """Fraction of pixels per DIFF_GRID cell that changed beyond codec noise."""
+        changed = (cv2.absdiff(gray1, gray2) > self.PIXEL_DELTA).astype(np.float32)
+        return cv2.resize(
+            changed, (self.DIFF_GRID, self.DIFF_GRID), interpolation=cv2.INTER_AREA
+        )
+    
+    def _ink_mask(self, thumbnail: np.ndarray) -> np.ndarray:
+        """
+        Pixels of a thumbnail that stand out from the slide background.
         
-        # Normalize to 0-1 range
-        normalized_diff = np.sum(diff) / (diff.size * 255)
+        The background is taken as the median gray level, which holds for
+        text-on-plain-background slides in both light and dark themes.
+        """
+        background = np.median(thumbnail)
+        return cv2.absdiff(thumbnail, np.full_like(thumbnail, background)) > self.PIXEL_DELTA
+    
+    def _is_build_step(self, ink: np.ndarray, next_ink: np.ndarray) -> bool:
+        """
+        Check whether a page is an earlier step of a progressive build.
+        
+        Args:
+            ink: Ink mask of the earlier page
+            next_ink: Ink mask of the later page
+            
+        Returns:
+            True if the later page only adds to the earlier one
+        """
+        if ink.shape != next_ink.shape:
+            return False
+        
+        added = np.count_nonzero(next_ink & ~ink)
+        removed = np.count_nonzero(ink & ~next_ink)
         
-        return normalized_diff
+        return added > 0 and removed <= self.BUILD_TOLERANCE * added
     
     def remove_duplicates_by_similarity(
-        self, frames: List[np.ndarray], similarity_threshold: int = 5
-    ) -> List[np.ndarray]:
+        self, frames: List, similarity_threshold: int = 5,
+        hashes: Optional[np.ndarray] = None
+    ) -> List:
         """
         Remove near-duplicate frames using stricter similarity threshold.
-        Useful for final cleanup of detected pages.
+        Useful for final cleanup of detected pages, e.g. slides the
+        lecturer went back to.
+        
+        Kept pages live in a HashIndex, so each frame is checked with a
+        multi-index lookup instead of a comparison against every kept page.
         
         Args:
-            frames: List of frames to deduplicate
+            frames: List of frames to deduplicate (or any items, e.g.
+                FrameHandles, if their hashes are passed in)
             similarity_threshold: Hamming distance threshold (lower = stricter)
+            hashes: Precomputed packed pHashes of frames (optional)
             
         Returns:
             List of unique frames
@@ -181,21 +405,226 @@ class PageDetector:
         if not frames:
             return []
         
+        if hashes is None:
+            # Hash every frame in one batch
+            hashes = self.hasher.hash_batch(frames)
+        
+        index = HashIndex(max_distance=similarity_threshold)
         unique_frames = []
-        unique_hashes = []
         
-        for frame in frames:
-            current_hash = self._calculate_phash(frame)
-            
-            # Check against all existing unique frames
-            is_duplicate = False
-            for existing_hash in unique_hashes:
-                if current_hash - existing_hash <= similarity_threshold:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
+        for frame, current_hash in zip(frames, hashes):
+            if index.nearest(current_hash) is None:
+                index.add(current_hash)
                 unique_frames.append(frame)
-                unique_hashes.append(current_hash)
         
         return unique_frames
+
+
+class PageDetectionSession:
+    """
+    Stateful, incremental page detection.
+    
+    Frames are pushed one at a time; each page is returned by push() as
+    soon as the next page starts and it is confirmed to have been shown for
+    min_page_duration, so downstream stages can work on early pages while
+    later ones are still being decoded. flush() finishes the last page.
+    
+    Only a hash and a small thumbnail of the current page and of the
+    previous sample are kept for comparison, plus the full-resolution
+    frame of the current page candidate. The candidate is the best
+    exposed, sharpest frame of the segment so far, not simply the latest,
+    so pages are not represented by a blurred or mid-fade sample.
+    
+    With collapse_builds, a finished page is held back while the next page
+    only adds ink to it (bullets revealed one at a time) and replaced by
+    it, so a build is emitted once, in its final state, dated from its
+    first step. Pages that are not build steps are emitted as soon as the
+    next page starts, as before.
+    """
+    
+    def __init__(
+        self, detector: PageDetector, store: Optional[FrameStore] = None,
+        dedupe_threshold: Optional[int] = None, mask: Optional[np.ndarray] = None
+    ):
+        """
+        Initialize detection session.
+        
+        Args:
+            detector: PageDetector providing thresholds and comparisons
+            store: Optional on-disk FrameStore; finished pages are written
+                there and FrameInfo.frame is a FrameHandle instead
+            dedupe_threshold: Drop pages within this Hamming distance of
+                an earlier page (default: keep revisited pages)
+            mask: Slide mask (see PageDetector.estimate_slide_mask); frames
+                are compared on the slide region only
+        """
+        self.detector = detector
+        self.store = store
+        self.mask = mask
+        self.index = HashIndex(dedupe_threshold) if dedupe_threshold is not None else None
+        
+        self.page_hash = None
+        self.page_thumbnail = None
+        self.page_score = 0.0
+        self.previous_thumbnail = None
+        self.candidate_page = None
+        self.candidate_proxy = None
+        self.candidate_score = None
+        self.candidate_thumbnail = None
+        self.candidate_time = 0.0
+        self.pending = None
+        self.pending_ink = None
+        self.last_timestamp = None
+    
+    def push(
+        self, frame: np.ndarray, timestamp: float,
+        proxy: Optional[np.ndarray] = None
+    ) -> List[FrameInfo]:
+        """
+        Feed the next sampled frame.
+        
+        Args:
+            frame: Full-resolution frame
+            timestamp: Video timestamp in seconds
+            proxy: Grayscale proxy of the frame (built if not given)
+            
+        Returns:
+            Pages finished by this frame (usually none, at most one)
+        """
+        detector = self.detector
+        previous_timestamp, self.last_timestamp = self.last_timestamp, timestamp
+        
+        # Quality metrics are memoized on the analysis and the proxy is
+        # handed on with the page, so later stages don't recompute them
+        analysis = FrameAnalysis(frame, proxy)
+        masked = detector.apply_mask(analysis.proxy, self.mask)
+        
+        # Calculate perceptual hash and diff thumbnail
+        current_hash = detector.hasher.hash(masked)
+        thumbnail = make_proxy(masked, width=detector.THUMBNAIL_WIDTH)
+        
+        # First frame
+        if self.page_hash is None:
+            self.page_hash = current_hash
+            self.page_thumbnail = self.previous_thumbnail = thumbnail
+            self.candidate_page = frame
+            self.candidate_proxy = analysis.proxy
+            self.candidate_score = detector._quality_score(analysis)
+            self.candidate_thumbnail = thumbnail
+            self.candidate_time = timestamp
+            return []
+        
+        # Compare with the page currently on screen
+        change = detector._classify_change(
+            thumbnail, current_hash, self.page_hash,
+            self.page_thumbnail, self.previous_thumbnail
+        )
+        self.previous_thumbnail = thumbnail
+        
+        if change == 'same':
+            # Same page, keep whichever frame is the better shot of it
+            score = detector._quality_score(analysis)
+            if score >= self.candidate_score:
+                self.candidate_page = frame
+                self.candidate_proxy = analysis.proxy
+                self.candidate_score = score
+                self.candidate_thumbnail = thumbnail
+            return []
+        
+        if change == 'changing':
+            # Still in motion, keep the last settled frame
+            return []
+        
+        # A change that had to settle was already on screen at the
+        # previous sample
+        page_start = previous_timestamp if change == 'settled' else timestamp
+        
+        # Check if candidate page was shown long enough
+        finished = self._finish(page_start)
+        
+        # The new page is the reference from now on, even if the
+        # previous one was too short to keep
+        self.page_score = detector._calculate_frame_difference(thumbnail, self.page_thumbnail)
+        self.page_hash = current_hash
+        self.page_thumbnail = thumbnail
+        
+        # Set new candidate
+        self.candidate_page = frame
+        self.candidate_proxy = analysis.proxy
+        self.candidate_score = detector._quality_score(analysis)
+        self.candidate_thumbnail = thumbnail
+        self.candidate_time = page_start
+        
+        # The held page can only grow into a build if the new page adds to it
+        if self.pending is not None and not self._continues_build(thumbnail):
+            finished.extend(self._emit())
+        
+        return finished
+    
+    def flush(self) -> List[FrameInfo]:
+        """Finish the last page if it was shown long enough."""
+        if self.last_timestamp is None:
+            return []
+        
+        finished = self._finish(self.last_timestamp) + self._emit()
+        self.candidate_page = None
+        return finished
+    
+    def _continues_build(self, thumbnail: np.ndarray) -> bool:
+        """Check whether a page adds to the held page as a build step."""
+        return self.detector.collapse_builds and self.detector._is_build_step(
+            self.pending_ink, self.detector._ink_mask(thumbnail)
+        )
+    
+    def _finish(self, end_time: float) -> List[FrameInfo]:
+        """
+        Close the current candidate if it lasted min_page_duration.
+        
+        The page is held back as pending; it replaces the pending page if
+        it is the next step of the same build, otherwise the previously
+        pending page is emitted.
+        """
+        if self.candidate_page is None:
+            return []
+        
+        if end_time - self.candidate_time < self.detector.min_page_duration:
+            return []
+        
+        page = FrameInfo(
+            frame=self.candidate_page,
+            timestamp=self.candidate_time,
+            hash_value=self.page_hash,
+            difference_score=self.page_score,
+            proxy=self.candidate_proxy
+        )
+        
+        finished = []
+        if self.pending is not None and self._continues_build(self.candidate_thumbnail):
+            # Final state wins, dated from when the build started
+            page.timestamp = self.pending.timestamp
+        else:
+            finished = self._emit()
+        
+        self.pending = page
+        self.pending_ink = self.detector._ink_mask(self.candidate_thumbnail)
+        
+        if not self.detector.collapse_builds:
+            finished.extend(self._emit())
+        
+        return finished
+    
+    def _emit(self) -> List[FrameInfo]:
+        """Hand over the pending page, unless it duplicates an earlier one."""
+        page, self.pending = self.pending, None
+        if page is None:
+            return []
+        
+        if self.index is not None:
+            if self.index.nearest(page.hash_value) is not None:
+                return []
+            self.index.add(page.hash_value, timestamp=page.timestamp)
+        
+        if self.store is not None:
+            page.frame = self.store.put(page.frame, page.timestamp)
+        
+        return [page]
@@ -0,0 +1,217 @@
+import sqlite3
+import threading
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from .frame_analysis import FrameAnalysis, make_proxy
+from .frame_hasher import FrameHasher
+from .hash_index import HashIndex
+
+
+class SlideCache:
+    """
+    Persistent cache of processed slides, shared across videos and jobs.
+
+    Course series reuse title, agenda and recap slides across many videos.
+    Each processed page is stored under its pHash together with its cleaned
+    image and OCR text, so a slide seen before skips cleaning and OCR
+    entirely.
+
+    The pHash only narrows the lookup down: slides within HASH_RADIUS bits
+    are candidates (a re-encode at another resolution or bitrate moves the
+    hash by a few bits), found through a HashIndex over the stored hashes
+    that is loaded when the cache opens. A hit also needs the pixel
+    signature to match. The signature is a small grayscale thumbnail, and
+    it must not have any grid cell with more than MAX_CELL_CHANGE of its
+    pixels changed. This keeps slides that merely hash alike (same layout,
+    one word different) apart. Re-encodes of the same slide at another
+    resolution or bitrate still match. A miss only costs the normal
+    processing.
+
+    Backed by a single SQLite file. Least recently used slides are evicted
+    once the stored images grow past max_bytes.
+    """
+
+    # Hamming distance within which stored slides are signature-checked
+    HASH_RADIUS = 8
+
+    # Signature thumbnail width, and the grid / pixel delta used to compare
+    # signatures (the same measure PageDetector uses for "same page")
+    SIGNATURE_WIDTH = 160
+    SIGNATURE_GRID = 16
+    PIXEL_DELTA = 32
+    MAX_CELL_CHANGE = 0.05
+
+    def __init__(self, path: Path, max_bytes: int = 2 * 1024 ** 3):
+        """
+        Initialize slide cache.
+
+        Args:
+            path: SQLite database file (created if missing)
+            max_bytes: Size cap on stored images before least recently
+                used slides are evicted
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hasher = FrameHasher('phash')
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS slides ("
+                " id INTEGER PRIMARY KEY,"
+                " phash INTEGER NOT NULL,"
+                " height INTEGER NOT NULL,"
+                " width INTEGER NOT NULL,"
+                " signature BLOB NOT NULL,"
+                " image BLOB NOT NULL,"
+                " text TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS slides_phash ON slides (phash)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS slides_last_used ON slides (last_used)"
+            )
+        self._load_index()
+
+    def _load_index(self):
+        """(Re)build the in-memory hash index from the database."""
+        self.index = HashIndex(self.HASH_RADIUS)
+        for slide_id, phash in self._db.execute("SELECT id, phash FROM slides"):
+            self.index.add(phash & 0xFFFFFFFFFFFFFFFF, page_id=slide_id)
+
+    def key(self, frame: Union[np.ndarray, FrameAnalysis]) -> Tuple[int, np.ndarray]:
+        """
+        Compute the cache key of a raw (uncleaned) page frame.
+
+        Args:
+            frame: The frame, its FrameAnalysis to reuse its proxy, or a
+                proxy with non-slide areas blanked (PageDetector.apply_mask)
+
+        Returns:
+            (pHash as a signed 64-bit int, signature thumbnail) tuple
+        """
+        proxy = FrameAnalysis.of(frame).proxy
+        phash = self.hasher.hash(proxy)
+        signature = make_proxy(proxy, width=self.SIGNATURE_WIDTH)
+
+        # SQLite integers are signed 64-bit
+        return int(np.uint64(phash).view(np.int64)), signature
+
+    def get(self, key: Tuple[int, np.ndarray]) -> Optional[Tuple[np.ndarray, str]]:
+        """
+        Look up a processed slide and mark it as recently used.
+
+        Returns:
+            (cleaned image, OCR text), or None on a miss
+        """
+        phash, signature = key
+
+        with self._lock, self._db:
+            # Nearest candidates first
+            ids = [record.page_id for record, _ in self.index.query(phash & 0xFFFFFFFFFFFFFFFF)]
+            if not ids:
+                return None
+            rows = {
+                row[0]: row[1:]
+                for row in self._db.execute(
+                    "SELECT id, height, width, signature FROM slides"
+                    f" WHERE id IN ({','.join('?' * len(ids))})", ids
+                )
+            }
+
+            for slide_id in ids:
+                if slide_id not in rows:
+                    continue
+                height, width, stored = rows[slide_id]
+                stored = np.frombuffer(stored, dtype=np.uint8).reshape(height, width)
+                if self._signatures_match(signature, stored):
+                    break
+            else:
+                return None
+
+            image, text = self._db.execute(
+                "SELECT image, text FROM slides WHERE id = ?", (slide_id,)
+            ).fetchone()
+            self._db.execute(
+                "UPDATE slides SET last_used = ? WHERE id = ?", (time.time(), slide_id)
+            )
+
+        image = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        return image, text
+
+    def put(self, key: Tuple[int, np.ndarray], image: np.ndarray, text: str):
+        """
+        Store a processed slide, then enforce the size cap.
+
+        Args:
+            key: Key of the raw frame, from key()
+            image: Cleaned page image
+            text: OCR text of the page
+        """
+        phash, signature = key
+
+        # PNG keeps slide text lossless
+        ok, encoded = cv2.imencode('.png', np.ascontiguousarray(image))
+        if not ok:
+            return
+
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO slides (phash, height, width, signature, image, text, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    phash, *signature.shape, np.ascontiguousarray(signature).tobytes(),
+                    encoded.tobytes(), text, time.time()
+                )
+            )
+            self.index.add(phash & 0xFFFFFFFFFFFFFFFF, page_id=cursor.lastrowid)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used slides until images fit in max_bytes."""
+        with self._lock, self._db:
+            total = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(image)), 0) FROM slides"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            rows = self._db.execute(
+                "SELECT id, LENGTH(image) FROM slides ORDER BY last_used"
+            ).fetchall()
+            for slide_id, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM slides WHERE id = ?", (slide_id,))
+                total -= size
+
+            # HashIndex can't remove entries; drop the evicted ones
+            self._load_index()
+
+    def _signatures_match(self, a: np.ndarray, b: np.ndarray) -> bool:
+        """Check that no grid cell of two signatures changed noticeably."""
+        if a.shape != b.shape:
+            return False
+
+        changed = (cv2.absdiff(a, b) > self.PIXEL_DELTA).astype(np.float32)
+        cells = cv2.resize(
+            changed, (self.SIGNATURE_GRID, self.SIGNATURE_GRID), interpolation=cv2.INTER_AREA
+        )
+        return float(cells.max()) <= self.MAX_CELL_CHANGE
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM slides").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,163 @@
+import cv2
+import functools
+import numpy as np
+from typing import Callable, Optional, Sequence
+
+from .frame_analysis import make_proxy
+
+
+class SlideLocator:
+    """
+    Finds the slide inside a larger frame, once per video.
+
+    Conference captures and presenter views show the slide as a rectangle
+    (or, filmed at an angle, a quadrilateral) inside the frame. The locator
+    looks for a large convex quad in the contours of a few sampled proxies
+    and accepts it only if it sits in the same place in most of them, so
+    a passing rectangle (a whiteboard, a window) isn't mistaken for the
+    slide. A quad is also rejected when its surround looks like more slide:
+    a content box or border drawn by the deck template sits on the same
+    background as the title and text around it, while a slide inside a
+    capture is surrounded by a darker (or lighter) room or UI, or by
+    nothing at all.
+
+    Quads are in normalized [0, 1] coordinates, corners ordered top-left,
+    top-right, bottom-right, bottom-left, so one estimate from proxies
+    applies to the full-resolution frames too.
+    """
+
+    # The slide must cover this fraction of the frame; above MAX_AREA the
+    # slide already fills the frame and there is nothing to crop
+    MIN_AREA = 0.2
+    MAX_AREA = 0.9
+
+    # Fraction of sampled frames the same quad must be found in, and how
+    # far (fraction of frame size) its corners may move between them
+    STABLE_FRACTION = 0.5
+    CORNER_TOLERANCE = 0.02
+
+    # Quads whose edges are this close to axis-aligned are cropped
+    # (a zero-copy view) instead of perspective-warped
+    AXIS_TOLERANCE = 0.01
+
+    # The surround counts as non-slide if its median gray differs from the
+    # inside's by BACKGROUND_DELTA, or if at most SURROUND_EDGES of it is
+    # edges (nothing of the slide is lost by cropping it). BORDER_MARGIN
+    # proxy pixels either side of the quad are ignored.
+    BACKGROUND_DELTA = 40
+    SURROUND_EDGES = 0.01
+    BORDER_MARGIN = 4
+
+    def locate(self, frames: Sequence[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Find the temporally stable slide quad.
+
+        Args:
+            frames: A few frames (or proxies) sampled across the video
+
+        Returns:
+            4x2 float32 array of normalized corners, or None if no slide
+            rectangle is stable across the samples
+        """
+        quads = [quad for quad in map(self._find_quad, frames) if quad is not None]
+        if not quads:
+            return None
+
+        # The quad with most others close to it wins
+        stacked = np.stack(quads)
+        close = [
+            np.abs(stacked - quad).max(axis=(1, 2)) <= self.CORNER_TOLERANCE
+            for quad in quads
+        ]
+        best = max(close, key=np.count_nonzero)
+
+        if np.count_nonzero(best) < self.STABLE_FRACTION * len(frames):
+            return None
+
+        return np.median(stacked[best], axis=0).astype(np.float32)
+
+    def transform(self, quad: Optional[np.ndarray]) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+        """Frame transform cutting out the slide, or None if quad is None."""
+        if quad is None:
+            return None
+        # A partial rather than a lambda so it can be sent to worker processes
+        return functools.partial(self.warp, quad=quad)
+
+    def warp(self, frame: np.ndarray, quad: np.ndarray) -> np.ndarray:
+        """
+        Cut the slide out of a frame.
+
+        Args:
+            frame: Frame (or proxy) of any resolution
+            quad: Normalized corners from locate()
+
+        Returns:
+            The slide area; a view into frame when the quad is axis-aligned
+        """
+        h, w = frame.shape[:2]
+        corners = quad * np.array([w, h], dtype=np.float32)
+        tl, tr, br, bl = corners
+
+        tolerance = self.AXIS_TOLERANCE * max(w, h)
+        if (
+            abs(tl[1] - tr[1]) <= tolerance and abs(bl[1] - br[1]) <= tolerance
+            and abs(tl[0] - bl[0]) <= tolerance and abs(tr[0] - br[0]) <= tolerance
+        ):
+            x0, x1 = round((tl[0] + bl[0]) / 2), round((tr[0] + br[0]) / 2)
+            y0, y1 = round((tl[1] + tr[1]) / 2), round((bl[1] + br[1]) / 2)
+            return frame[max(0, y0):min(h, y1), max(0, x0):min(w, x1)]
+
+        width = round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl)))
+        height = round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr)))
+        target = np.array(
+            [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]],
+            dtype=np.float32
+        )
+        matrix = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(frame, matrix, (width, height), flags=cv2.INTER_LINEAR)
+
+    def _find_quad(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Largest convex quad of slide size in one frame, normalized."""
+        gray = make_proxy(frame)
+        h, w = gray.shape[:2]
+
+        # Close small gaps in the slide border before tracing contours
+        raw_edges = cv2.Canny(gray, 50, 150)
+        edges = cv2.dilate(raw_edges, np.ones((3, 3), np.uint8))
+        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        best, best_area = None, 0.0
+        for contour in contours:
+            area = cv2.contourArea(contour) / (w * h)
+            if not self.MIN_AREA <= area <= self.MAX_AREA or area <= best_area:
+                continue
+
+            approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+            if len(approx) != 4 or not cv2.isContourConvex(approx):
+                continue
+
+            best, best_area = approx.reshape(4, 2).astype(np.float32), area
+
+        if best is None or not self._surround_is_outside(gray, raw_edges, best):
+            return None
+
+        # Order corners: top-left, top-right, bottom-right, bottom-left
+        sums, diffs = best.sum(axis=1), best[:, 1] - best[:, 0]
+        ordered = best[[np.argmin(sums), np.argmin(diffs), np.argmax(sums), np.argmax(diffs)]]
+
+        return ordered / np.array([w, h], dtype=np.float32)
+
+    def _surround_is_outside(self, gray: np.ndarray, edges: np.ndarray, quad: np.ndarray) -> bool:
+        """Check that the area around a quad doesn't look like part of the slide."""
+        mask = np.zeros(gray.shape, np.uint8)
+        cv2.fillConvexPoly(mask, quad.astype(np.int32), 255)
+
+        kernel = np.ones((2 * self.BORDER_MARGIN + 1,) * 2, np.uint8)
+        inside = cv2.erode(mask, kernel) > 0
+        outside = cv2.dilate(mask, kernel) == 0
+        if not inside.any() or not outside.any():
+            return True
+
+        if abs(float(np.median(gray[outside])) - float(np.median(gray[inside]))) >= self.BACKGROUND_DELTA:
+            return True
+        return np.count_nonzero(edges[outside]) / np.count_nonzero(outside) <= self.SURROUND_EDGES
@@ -1,73 +1,620 @@
 import cv2
 import yt_dlp
 import os
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+import math
+import pickle
+import tempfile
 import numpy as np
 import shutil
 
+from .download_cache import DownloadCache
+from .format_selector import FormatSelector
+from .frame_analysis import make_proxy
+from .frame_store import FrameHandle, FrameStore
+
+try:
+    import av  # PyAV, optional: only needed for keyframe sampling
+except ImportError:
+    av = None
+
+logger = logging.getLogger(__name__)
+
 
 class VideoProcessor:
     """Service for downloading and processing YouTube videos."""
     
-    def __init__(self, fps: int = 1):
+    # Frame sampling strategies:
+    #   read - decode and convert every frame (original behaviour)
+    #   grab - grab() skipped frames, retrieve() only sampled ones
+    #   seek - jump straight to each sampled frame (best for sparse rates)
+    #   keyframe - decode only codec keyframes (I-frames), requires PyAV
+    #   auto - seek when samples are SEEK_MIN_INTERVAL+ seconds apart, else grab
+    SAMPLING_MODES = ('auto', 'read', 'grab', 'seek', 'keyframe')
+    SEEK_MIN_INTERVAL = 2.0
+    
+    # Keyframe sampling falls back to interval sampling if any two keyframes
+    # are further apart than this, since slides in the gap would be missed
+    KEYFRAME_MAX_GAP = 5.0
+    
+    # Parallel decoding splits the video into segments of this length
+    PARALLEL_SEGMENT_SECONDS = 30.0
+    
+    # Adaptive sampling probes this far apart and bisects where pages change
+    ADAPTIVE_COARSE_INTERVAL = 5.0
+    
+    # Fragments (DASH/HLS segments) yt-dlp fetches in parallel per download
+    CONCURRENT_FRAGMENTS = 4
+    
+    def __init__(
+        self, fps: float = 1, sampling: str = 'auto', workers: int = 1,
+        cache: Optional[DownloadCache] = None,
+        format_selector: Optional[FormatSelector] = None
+    ):
         """
         Initialize video processor.
         
         Args:
             fps: Frames per second to extract (default: 1 frame per second)
+            sampling: Frame sampling strategy, one of SAMPLING_MODES
+            workers: Number of processes to decode long videos with
+            cache: Persistent download cache shared across jobs (optional)
+            format_selector: Picks the lowest legible resolution to download
+                instead of the highest allowed by quality (optional)
         """
+        if sampling not in self.SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {sampling}")
+        
         self.fps = fps
+        self.sampling = sampling
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.format_selector = format_selector
         
+    @property
+    def supports_sections(self) -> bool:
+        """Whether download_video can fetch just a time range (needs FFmpeg)."""
+        return shutil.which('ffmpeg') is not None
+    
     async def download_video(
-        self, url: str, quality: str, output_dir: Path
+        self, url: str, quality: str, output_dir: Path,
+        start: Optional[float] = None, end: Optional[float] = None,
+        progress: Optional[Callable[[dict], None]] = None
     ) -> Path:
         """
         Download YouTube video using yt-dlp.
         
+        The download runs in a worker thread, so the event loop (and status
+        polling) keeps running while it is in progress.
+        
         Args:
             url: YouTube video URL
             quality: Video quality (e.g., '720p', '1080p')
             output_dir: Directory to save the video
+            start: Only download from this many seconds in (optional)
+            end: Only download up to this many seconds in (optional)
+            progress: Called from the download thread with a dict of
+                downloaded_bytes, total_bytes (None if unknown) and speed
+                (bytes/s, None if unknown) as data arrives (optional)
             
         Returns:
-            Path to downloaded video file
+            Path to downloaded video file. With a download cache the file
+            lives in the cache and must be handed back with release_video.
+            If a range was given and supports_sections is set, the file
+            holds only that range and its timestamps start at 0.
         """
-        output_dir.mkdir(parents=True, exist_ok=True)
+        height = int(quality[:-1])
         
         # Configure yt-dlp options
-        # Try to merge video+audio, but fallback to single format if FFmpeg not available
+        # Video only: the pipeline never uses the audio track, and skipping
+        # it also avoids needing FFmpeg to merge streams
         ydl_opts = {
-            'format': f'bestvideo[height<={quality[:-1]}][ext=mp4]+bestaudio[ext=m4a]/best[height<={quality[:-1]}][ext=mp4]/best',
+            'format': f'bestvideo[height<={height}][ext=mp4]/bestvideo[height<={height}]/best[height<={height}][ext=mp4]/best',
             'outtmpl': str(output_dir / 'video.%(ext)s'),
             'quiet': False,
             'no_warnings': False,
-            'merge_output_format': 'mp4',
             # Don't abort if FFmpeg is missing, just use best single format
             'ignoreerrors': False,
             'no_abort_on_error': True,
+            'concurrent_fragment_downloads': self.CONCURRENT_FRAGMENTS,
         }
         
-        # Download video
+        if progress is not None:
+            ydl_opts['progress_hooks'] = [_progress_hook(progress)]
+        
+        section = None
+        if (start is not None or end is not None) and self.supports_sections:
+            section = (start or 0.0, end if end is not None else math.inf)
+            ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, [section])
+        
+        # With a format selector, cache entries are keyed by the requested
+        # quality, so a repeat extraction finds its entry before probing.
+        # The metadata fetched here is reused for the download itself.
+        info = None
+        format_key = None
+        if self.format_selector is not None:
+            info = await asyncio.to_thread(
+                _extract_info, url, {'quiet': True, 'no_warnings': True}
+            )
+            format_key = f"legible{height}p"
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.lookup(self._cache_key(info['id'], format_key, section))
+            
+            if cached is None:
+                selected = await self.format_selector.select(info, height)
+                if selected is not None:
+                    logger.info("Selected format %s (%sp)", selected['format_id'], selected['height'])
+                    ydl_opts['format'] = selected['format_id']
+        
+        if self.cache is not None:
+            return await asyncio.to_thread(
+                self._download_cached, url, ydl_opts, section, format_key, info
+            )
+        
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        return await asyncio.to_thread(self._download, url, ydl_opts, info)
+    
+    def _download(self, url: str, ydl_opts: dict, info: Optional[dict] = None) -> Path:
+        """
+        Blocking yt-dlp download, run off the event loop.
+        
+        If metadata was already fetched (info), it is processed with
+        ydl_opts instead of being fetched again.
+        """
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+            if info is None:
+                info = ydl.extract_info(url, download=True)
+            else:
+                info = ydl.process_ie_result(info, download=True)
             filename = ydl.prepare_filename(info)
         
         return Path(filename)
     
-    async def extract_frames(
-        self, video_path: Path
-    ) -> List[Tuple[np.ndarray, float]]:
+    def _cache_key(
+        self, video_id: str, format_id: str,
+        section: Optional[Tuple[float, float]] = None
+    ) -> str:
+        """Download cache key of a video, format and downloaded time range."""
+        if section is not None:
+            format_id += f"@{section[0]:g}-{section[1]:g}"
+        return self.cache.make_key(video_id, format_id)
+    
+    def _download_cached(
+        self, url: str, ydl_opts: dict,
+        section: Optional[Tuple[float, float]] = None,
+        format_key: Optional[str] = None, info: Optional[dict] = None
+    ) -> Path:
         """
-        Extract frames from video at specified FPS.
+        Download through the cache, keyed by video ID, selected format (or
+        format_key, if given) and downloaded time range.
+        
+        Only metadata is fetched up front, and not even that if the caller
+        already has it (info); on a cache hit the video itself never
+        touches the network. The returned entry holds a reference until
+        release_video is called.
+        """
+        if info is None:
+            with yt_dlp.YoutubeDL({**ydl_opts, 'quiet': True}) as ydl:
+                info = ydl.extract_info(url, download=False)
+        
+        key = self._cache_key(
+            info['id'], format_key or info.get('format_id') or 'default', section
+        )
+        self.cache.acquire(key)
+        
+        try:
+            with self.cache.download_lock(key):
+                cached = self.cache.lookup(key)
+                if cached is not None:
+                    logger.info("Download cache hit: %s", key)
+                    return cached
+                
+                entry_dir = self.cache.entry_dir(key)
+                entry_dir.mkdir(parents=True, exist_ok=True)
+                
+                cache_opts = {**ydl_opts, 'outtmpl': str(entry_dir / 'video.%(ext)s')}
+                with yt_dlp.YoutubeDL(cache_opts) as ydl:
+                    ydl.process_ie_result(info, download=True)
+                
+                self.cache.commit(key)
+                video_path = self.cache.lookup(key)
+                if video_path is None:
+                    raise ValueError(f"Download produced no video file: {url}")
+                return video_path
+        except Exception:
+            self.cache.release(key)
+            raise
+    
+    def release_video(self, video_path: Path):
+        """Release a video returned by download_video (no-op if uncached)."""
+        if self.cache is None or video_path is None:
+            return
+        
+        key = self.cache.key_for(video_path)
+        if key is not None:
+            self.cache.release(key)
+    
+    async def resolve_chapter(
+        self, url: str, chapter: str
+    ) -> Tuple[float, float]:
+        """
+        Look up a chapter's time range from yt-dlp chapter metadata.
         
         Args:
-            video_path: Path to video file
+            url: YouTube video URL
+            chapter: Chapter title (case-insensitive) or 1-based chapter number
             
         Returns:
-            List of (frame, timestamp) tuples
+            (start, end) of the chapter in seconds
+        """
+        ydl_opts = {'quiet': True, 'no_warnings': True}
+        info = await asyncio.to_thread(_extract_info, url, ydl_opts, process=False)
+        
+        chapters = info.get('chapters') or []
+        if not chapters:
+            raise ValueError(f"Video has no chapters: {url}")
+        
+        if chapter.isdigit() and 1 <= int(chapter) <= len(chapters):
+            match = chapters[int(chapter) - 1]
+        else:
+            match = next(
+                (c for c in chapters if c.get('title', '').lower() == chapter.lower()),
+                None
+            )
+        
+        if match is None:
+            titles = ', '.join(repr(c.get('title')) for c in chapters)
+            raise ValueError(f"Chapter {chapter!r} not found, available: {titles}")
+        
+        return float(match['start_time']), float(match['end_time'])
+    
+    async def resolve_stream_url(
+        self, url: str, quality: str
+    ) -> Optional[str]:
+        """
+        Resolve a directly decodable media URL for progressive processing.
+        
+        Picks a single-file format served over plain HTTP(S) so the decoder
+        can read (and range-seek) it while it is still arriving, with no
+        temp file. Fragmented formats (DASH/HLS) can't be read that way.
+        
+        Args:
+            url: YouTube video URL
+            quality: Video quality (e.g., '720p', '1080p')
+            
+        Returns:
+            Media URL accepted by iter_frames, or None if the video has no
+            progressive format (callers should fall back to download_video)
+        """
+        height = quality[:-1]
+        ydl_opts = {
+            # Video-only is fine: the pipeline never uses the audio track
+            'format': '/'.join(
+                f'{kind}[height<={height}][protocol={protocol}]'
+                for protocol in ('https', 'http')
+                for kind in ('bestvideo', 'best')
+            ),
+            'quiet': True,
+            'no_warnings': True,
+        }
+        
+        try:
+            info = await asyncio.to_thread(_extract_info, url, ydl_opts)
+        except yt_dlp.utils.DownloadError:
+            return None
+        
+        if info.get('protocol') not in ('http', 'https'):
+            return None
+        
+        return info.get('url')
+    
+    def iter_frames(
+        self, video_path: Path, with_proxy: bool = False,
+        differ: Optional[Callable[[np.ndarray, np.ndarray], bool]] = None,
+        start: Optional[float] = None, end: Optional[float] = None,
+        transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    ) -> Iterator[tuple]:
+        """
+        Lazily yield frames from video at specified FPS.
+        
+        Only the frame currently being yielded is held in memory, so peak
+        memory no longer grows with the length of the video.
+        
+        Args:
+            video_path: Path to video file, or an HTTP(S) media URL from
+                resolve_stream_url to decode while it downloads
+            with_proxy: Also yield a downscaled grayscale proxy per frame
+                (see frame_analysis.make_proxy) for cheap detection/scoring
+            differ: Optional page-change test on two proxies (e.g.
+                PageDetector.is_page_change). When given, the video is
+                sampled adaptively instead of at a fixed rate, see
+                _adaptive_frames.
+            start: Seek here (seconds) instead of decoding from the start
+            end: Stop decoding at this timestamp (seconds, exclusive)
+            transform: Applied to every decoded frame before anything else,
+                e.g. SlideLocator.transform to cut the slide out
+            
+        Yields:
+            (frame, timestamp) tuples in timestamp order, or
+            (frame, timestamp, proxy) tuples if with_proxy is set
+        """
+        if differ is not None:
+            samples = self._adaptive_frames(video_path, differ, start, end, transform)
+        else:
+            frames = self._sampled_frames(video_path, start, end)
+            if transform is not None:
+                frames = ((transform(frame), timestamp) for frame, timestamp in frames)
+            samples = (
+                (frame, timestamp, make_proxy(frame) if with_proxy else None)
+                for frame, timestamp in frames
+            )
+        
+        for frame, timestamp, proxy in samples:
+            if with_proxy:
+                yield frame, timestamp, proxy
+            else:
+                yield frame, timestamp
+    
+    def duration(self, video_path: Path) -> Optional[float]:
+        """Length of a video in seconds, or None if the container doesn't say."""
+        cap = cv2.VideoCapture(str(video_path))
+        try:
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+            return total_frames / video_fps if video_fps > 0 and total_frames > 0 else None
+        finally:
+            cap.release()
+    
+    def sample_proxy_pairs(
+        self, video_path: Path, pairs: int = 12, gap: float = 1.0,
+        spacing: float = 5.0, start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Decode a few proxy pairs, gap seconds apart, spread over the video.
+        
+        Cheap input for PageDetector.estimate_slide_mask: 2 * pairs seeks,
+        however long the video is. Short videos yield fewer pairs.
+        
+        Args:
+            video_path: Path to video file or HTTP(S) media URL
+            pairs: Maximum number of pairs to sample
+            gap: Seconds between the two frames of a pair
+            spacing: Minimum seconds between the starts of two pairs
+            start: Only sample from here (seconds)
+            end: Only sample up to here (seconds)
+            
+        Returns:
+            (proxy, proxy) tuples; empty if the length is unknown
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+        
+        try:
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if video_fps <= 0 or total_frames <= 0:
+                return []
+            
+            first = int((start or 0) * video_fps)
+            last = total_frames if end is None else min(total_frames, int(end * video_fps))
+            offset = max(1, int(gap * video_fps))
+            if last - offset <= first:
+                return []
+            
+            def sample(position):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+                ret, frame = cap.read()
+                return make_proxy(frame) if ret else None
+            
+            step = max(spacing * video_fps, (last - offset - first) / pairs)
+            samples = []
+            for position in np.arange(first, last - offset, step).astype(int)[:pairs]:
+                a, b = sample(position), sample(position + offset)
+                if a is not None and b is not None:
+                    samples.append((a, b))
+            return samples
+        finally:
+            cap.release()
+    
+    def _frame_range(
+        self, video_fps: float, frame_interval: int, total_frames: int,
+        start: Optional[float], end: Optional[float]
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Convert a time range to [start_frame, end_frame) on the sampling grid.
+        
+        The start is rounded up to the grid so a range samples exactly the
+        frames a full pass would have sampled inside it.
+        """
+        start_frame = 0
+        if start:
+            start_frame = math.ceil(start * video_fps / frame_interval) * frame_interval
+        
+        end_frame = total_frames if total_frames > 0 else None
+        if end is not None:
+            end_frame = math.ceil(end * video_fps)
+            if total_frames > 0:
+                end_frame = min(end_frame, total_frames)
+        
+        return start_frame, end_frame
+    
+    def _adaptive_frames(
+        self, video_path: Path, differ: Callable[[np.ndarray, np.ndarray], bool],
+        start: Optional[float] = None, end: Optional[float] = None,
+        transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    ) -> Iterator[Tuple[np.ndarray, float, np.ndarray]]:
+        """
+        Sample coarsely, bisecting only the intervals where the page changes.
+        
+        Probes are ADAPTIVE_COARSE_INTERVAL seconds apart. Wherever differ()
+        reports a change between two probes, the interval is bisected by
+        seeking until the transition is pinned down to 1/fps, the same
+        resolution as uniform sampling. Long static slides cost one decode
+        per probe instead of one per 1/fps.
+        
+        A slide shown entirely between two probes whose ends look alike is
+        not seen, so the coarse interval should stay near min_page_duration.
+        
+        With workers > 1, long ranges are split into segments that are
+        probed and bisected in worker processes (see
+        _parallel_adaptive_frames). differ and transform must then be
+        picklable, e.g. bound methods or functools.partial; a lambda keeps
+        sampling in this process.
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+        
+        try:
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            if video_fps <= 0:
+                raise ValueError(f"Could not read frame rate: {video_path}")
+            
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if total_frames <= 0:
+                # Length unknown (e.g. some live streams): can't bisect
+                cap.release()
+                for frame, timestamp in self._sampled_frames(video_path, start, end):
+                    if transform is not None:
+                        frame = transform(frame)
+                    yield frame, timestamp, make_proxy(frame)
+                return
+            
+            # Keep every probe on the uniform sampling grid
+            grid = max(1, int(video_fps / self.fps))
+            coarse = max(grid, int(self.ADAPTIVE_COARSE_INTERVAL * video_fps) // grid * grid)
+            first_position, end_frame = self._frame_range(
+                video_fps, grid, total_frames, start, end
+            )
+            last_position = (end_frame - 1) // grid * grid
+            if last_position < first_position:
+                return
+            
+            # Only worth paying process start-up for more than one segment
+            duration = (last_position - first_position) / video_fps
+            if (self.workers > 1 and duration > 2 * self.PARALLEL_SEGMENT_SECONDS
+                    and _picklable(differ, transform)):
+                cap.release()
+                yield from self._parallel_adaptive_frames(
+                    video_path, differ, transform, video_fps, grid, coarse,
+                    first_position, last_position
+                )
+                return
+            
+            yield from self._adaptive_range(
+                cap, video_fps, grid, coarse, first_position, last_position,
+                differ, transform
+            )
+        finally:
+            cap.release()
+    
+    def _adaptive_range(
+        self, cap: cv2.VideoCapture, video_fps: float, grid: int, coarse: int,
+        first_position: int, last_position: int,
+        differ: Callable[[np.ndarray, np.ndarray], bool],
+        transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    ) -> Iterator[Tuple[np.ndarray, float, np.ndarray]]:
+        """Probe and bisect [first_position, last_position], both ends included."""
+        def sample(position):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ret, frame = cap.read()
+            if not ret:
+                return None
+            if transform is not None:
+                frame = transform(frame)
+            return position, (frame, position / video_fps, make_proxy(frame))
+        
+        def refine(low, high):
+            # Yield the samples strictly between two probes, in order
+            if high[0] - low[0] <= grid:
+                return
+            
+            middle = sample(low[0] + (high[0] - low[0]) // grid // 2 * grid)
+            if middle is None:
+                return
+            
+            if differ(low[1][2], middle[1][2]):
+                yield from refine(low, middle)
+            yield middle[1]
+            if differ(middle[1][2], high[1][2]):
+                yield from refine(middle, high)
+        
+        previous = sample(first_position)
+        if previous is None:
+            return
+        yield previous[1]
+        
+        positions = list(range(first_position + coarse, last_position, coarse))
+        if last_position > first_position:
+            positions.append(last_position)
+        
+        for position in positions:
+            current = sample(position)
+            if current is None:
+                break
+            
+            if differ(previous[1][2], current[1][2]):
+                yield from refine(previous, current)
+            yield current[1]
+            previous = current
+    
+    def _parallel_adaptive_frames(
+        self, video_path: Path, differ: Callable[[np.ndarray, np.ndarray], bool],
+        transform: Optional[Callable[[np.ndarray], np.ndarray]],
+        video_fps: float, grid: int, coarse: int,
+        first_position: int, last_position: int
+    ) -> Iterator[Tuple[np.ndarray, float, np.ndarray]]:
         """
-        frames = []
+        Run adaptive sampling on time segments in worker processes.
+        
+        Segment boundaries sit on the coarse probe grid and each segment
+        ends on the probe the next one starts with, so every pair of
+        neighbouring probes (including those at a seam) is compared and
+        bisected exactly as in a single pass. The shared boundary probe is
+        yielded once; the merged stream matches _adaptive_range's.
+        """
+        segment_frames = int(self.PARALLEL_SEGMENT_SECONDS * video_fps)
+        segment_frames = max(coarse, segment_frames // coarse * coarse)
+        
+        segments = (
+            (str(video_path), differ, transform, grid, coarse,
+             start, min(start + segment_frames, last_position))
+            for start in range(first_position, last_position, segment_frames)
+        )
+        
+        last_timestamp = -1.0
+        for path, samples in self._run_segments(_adapt_segment, segments):
+            with FrameStore(path, index=[handle for handle, _ in samples]) as store:
+                for handle, proxy in samples:
+                    if handle.timestamp > last_timestamp:
+                        last_timestamp = handle.timestamp
+                        # Copy out of the mapping so the segment file can go
+                        yield np.array(store.get(handle)), handle.timestamp, proxy
+    
+    def _sampled_frames(
+        self, video_path: Path,
+        start: Optional[float] = None, end: Optional[float] = None
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """Yield (frame, timestamp) using the configured sampling strategy."""
+        if self.sampling == 'keyframe':
+            if self._keyframes_usable(video_path):
+                yield from self._keyframe_frames(video_path, start, end)
+                return
+            logger.warning(
+                "Keyframes unavailable or too sparse in %s, falling back to interval sampling",
+                video_path
+            )
         
         # Open video
         cap = cv2.VideoCapture(str(video_path))
@@ -75,17 +622,149 @@ class VideoProcessor:
         if not cap.isOpened():
             raise ValueError(f"Could not open video: {video_path}")
         
-        # Get video properties
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        try:
+            # Get video properties
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            if video_fps <= 0:
+                raise ValueError(f"Could not read frame rate: {video_path}")
+            
+            # Calculate frame interval (at least every frame)
+            frame_interval = max(1, int(video_fps / self.fps))
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            start_frame, end_frame = self._frame_range(
+                video_fps, frame_interval, total_frames, start, end
+            )
+            
+            # Only worth paying process start-up for more than one segment
+            duration = ((end_frame or 0) - start_frame) / video_fps
+            if self.workers > 1 and duration > 2 * self.PARALLEL_SEGMENT_SECONDS:
+                cap.release()
+                yield from self._parallel_frames(
+                    video_path, video_fps, frame_interval, start_frame, end_frame
+                )
+                return
+            
+            yield from self._sample_range(
+                cap, video_fps, frame_interval, start_frame, end_frame
+            )
+        finally:
+            cap.release()
+    
+    def _sample_range(
+        self, cap: cv2.VideoCapture, video_fps: float, frame_interval: int,
+        start_frame: int = 0, end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """Sample frames in [start_frame, end_frame) with the configured mode."""
+        if self._resolve_sampling(frame_interval / video_fps) == 'seek':
+            return self._seek_frames(
+                cap, video_fps, frame_interval, start_frame, end_frame
+            )
+        return self._decode_frames(
+            cap, video_fps, frame_interval, start_frame, end_frame
+        )
+    
+    def _parallel_frames(
+        self, video_path: Path, video_fps: float, frame_interval: int,
+        start_frame: int, end_frame: int
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        Decode time segments in worker processes and merge them in order.
         
-        # Calculate frame interval
-        frame_interval = int(video_fps / self.fps)
+        Segments are contiguous and their boundaries sit on the sampling
+        grid, so the merged stream has exactly the frames of a single pass
+        and slide changes at a seam are detected like any other.
+        """
+        # Keep segment boundaries on the global sampling grid
+        segment_frames = int(self.PARALLEL_SEGMENT_SECONDS * video_fps)
+        segment_frames = max(frame_interval, segment_frames // frame_interval * frame_interval)
         
-        frame_count = 0
-        extracted_count = 0
+        segments = (
+            (str(video_path), self.fps, self.sampling,
+             start, min(start + segment_frames, end_frame))
+            for start in range(start_frame, end_frame, segment_frames)
+        )
         
-        while True:
+        for path, handles in self._run_segments(_decode_segment, segments):
+            with FrameStore(path, index=handles) as store:
+                for handle in handles:
+                    # Copy out of the mapping so the segment file can go
+                    yield np.array(store.get(handle)), handle.timestamp
+    
+    def _run_segments(
+        self, worker: Callable[..., list], segments: Iterator[tuple]
+    ) -> Iterator[Tuple[Path, list]]:
+        """
+        Run worker on each segment's arguments in the process pool, in order.
+        
+        The worker gets the path of a fresh FrameStore file as its last
+        argument, writes its frames there and returns their handles, so
+        only handles (and small proxies) are pickled back instead of full
+        frames. At most `workers` segments are in flight, and a segment's
+        file is deleted once the caller asks for the next one, so memory
+        and disk stay bounded by the segment length rather than the video
+        length.
+        
+        Yields:
+            (store path, worker result) tuples in segment order
+        """
+        with tempfile.TemporaryDirectory(prefix='segments-') as directory, \
+                ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            numbered = enumerate(segments)
+            
+            def submit_next():
+                number, args = next(numbered, (None, None))
+                if args is not None:
+                    path = Path(directory) / f"{number}.bin"
+                    pending.append((path, pool.submit(worker, *args, str(path))))
+            
+            for _ in range(self.workers):
+                submit_next()
+            
+            try:
+                while pending:
+                    path, future = pending.popleft()
+                    result = future.result()
+                    submit_next()
+                    
+                    yield path, result
+                    path.unlink(missing_ok=True)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+    
+    def _resolve_sampling(self, sample_interval: float) -> str:
+        """Pick the concrete sampling mode for a sample spacing in seconds."""
+        if self.sampling in ('read', 'grab', 'seek'):
+            return self.sampling
+        
+        if sample_interval >= self.SEEK_MIN_INTERVAL:
+            return 'seek'
+        return 'grab'
+    
+    def _decode_frames(
+        self, cap: cv2.VideoCapture, video_fps: float, frame_interval: int,
+        start_frame: int = 0, end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        Walk the video sequentially, sampling every frame_interval frames.
+        
+        In grab mode skipped frames are only demuxed/decoded with grab() and
+        never converted to BGR; read mode converts every frame.
+        """
+        grab_only = self.sampling != 'read'
+        frame_count = start_frame
+        
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        
+        while end_frame is None or frame_count < end_frame:
+            if grab_only and frame_count % frame_interval != 0:
+                if not cap.grab():
+                    break
+                frame_count += 1
+                continue
+            
             ret, frame = cap.read()
             
             if not ret:
@@ -93,17 +772,219 @@ class VideoProcessor:
             
             # Extract frame at specified interval
             if frame_count % frame_interval == 0:
-                timestamp = frame_count / video_fps
-                frames.append((frame, timestamp))
-                extracted_count += 1
+                yield frame, frame_count / video_fps
             
             frame_count += 1
+    
+    def _seek_frames(
+        self, cap: cv2.VideoCapture, video_fps: float, frame_interval: int,
+        start_frame: int = 0, end_frame: Optional[int] = None
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        Seek directly to each sampled frame instead of walking the video.
         
-        cap.release()
+        Each seek lands on the preceding keyframe and decodes forward, so
+        this only pays off when samples are further apart than a GOP.
+        """
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if end_frame is None or (total_frames > 0 and end_frame > total_frames):
+            end_frame = total_frames if total_frames > 0 else None
+        position = start_frame
+        
+        while end_frame is None or position < end_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ret, frame = cap.read()
+            
+            if not ret:
+                break
+            
+            yield frame, position / video_fps
+            position += frame_interval
+    
+    def _keyframes_usable(self, video_path: Path) -> bool:
+        """
+        Check the container's keyframe index is dense enough to sample from.
+        
+        Only demuxes packets (no decoding), so this is cheap compared to
+        decoding the video.
+        """
+        if av is None:
+            return False
+        
+        try:
+            with av.open(str(video_path)) as container:
+                stream = container.streams.video[0]
+                keyframe_times = [
+                    float(packet.pts * stream.time_base)
+                    for packet in container.demux(stream)
+                    if packet.is_keyframe and packet.pts is not None
+                ]
+                duration = (container.duration or 0) / av.time_base
+        except (av.error.FFmpegError, IndexError):
+            return False
         
-        return frames
+        if len(keyframe_times) < 2:
+            return False
+        
+        # Include the tail after the last keyframe
+        boundaries = sorted(keyframe_times) + [max(duration, keyframe_times[-1])]
+        largest_gap = max(b - a for a, b in zip(boundaries, boundaries[1:]))
+        
+        return largest_gap <= self.KEYFRAME_MAX_GAP
+    
+    def _keyframe_frames(
+        self, video_path: Path,
+        start: Optional[float] = None, end: Optional[float] = None
+    ) -> Iterator[Tuple[np.ndarray, float]]:
+        """
+        Decode only keyframes in [start, end), at most one per 1/fps seconds.
+        
+        The decoder is told to skip every non-keyframe, so P/B-frames are
+        never decoded at all.
+        """
+        min_spacing = 1.0 / self.fps
+        last_timestamp = None
+        
+        with av.open(str(video_path)) as container:
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = 'NONKEY'
+            
+            if start:
+                # Lands on the last keyframe at or before start
+                container.seek(int(start / stream.time_base), stream=stream)
+            
+            for frame in container.decode(stream):
+                timestamp = frame.time
+                if timestamp is None or (start and timestamp < start):
+                    continue
+                if end is not None and timestamp >= end:
+                    break
+                
+                # Screen recordings can be all-intra; keep the requested rate
+                if last_timestamp is not None and timestamp - last_timestamp < min_spacing:
+                    continue
+                
+                last_timestamp = timestamp
+                yield frame.to_ndarray(format='bgr24'), timestamp
+    
+    async def stream_frames(
+        self, video_path: Path, with_proxy: bool = False,
+        differ: Optional[Callable[[np.ndarray, np.ndarray], bool]] = None,
+        start: Optional[float] = None, end: Optional[float] = None,
+        transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+    ) -> AsyncIterator[tuple]:
+        """
+        Async variant of iter_frames for use inside the event loop.
+        
+        Args:
+            video_path: Path to video file
+            with_proxy: Also yield a downscaled grayscale proxy per frame
+            differ: Page-change test enabling adaptive sampling
+            start: Seek here (seconds) instead of decoding from the start
+            end: Stop decoding at this timestamp (seconds, exclusive)
+            transform: Applied to every decoded frame (see iter_frames)
+            
+        Yields:
+            Same tuples as iter_frames
+        """
+        for item in self.iter_frames(video_path, with_proxy, differ, start, end, transform):
+            yield item
+            # Let other tasks (e.g. status polling) run between frames
+            await asyncio.sleep(0)
+    
+    async def extract_frames(
+        self, video_path: Path
+    ) -> List[Tuple[np.ndarray, float]]:
+        """
+        Extract frames from video at specified FPS.
+        
+        Holds every sampled frame in memory; prefer iter_frames or
+        stream_frames for long videos.
+        
+        Args:
+            video_path: Path to video file
+            
+        Returns:
+            List of (frame, timestamp) tuples
+        """
+        return [item async for item in self.stream_frames(video_path)]
     
     def cleanup(self, directory: Path):
         """Clean up temporary files."""
         if directory.exists():
-            shutil.rmtree(directory)
+            # Memory-mapped frame views can still pin files on Windows
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _extract_info(url: str, ydl_opts: dict, **kwargs) -> dict:
+    """Fetch video metadata only (blocking, run via asyncio.to_thread)."""
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=False, **kwargs)
+
+
+def _progress_hook(callback: Callable[[dict], None]) -> Callable[[dict], None]:
+    """Adapt a progress callback to yt-dlp's progress_hooks interface."""
+    def hook(status: dict):
+        if status.get('status') not in ('downloading', 'finished'):
+            return
+        callback({
+            'downloaded_bytes': status.get('downloaded_bytes') or 0,
+            'total_bytes': status.get('total_bytes') or status.get('total_bytes_estimate'),
+            'speed': status.get('speed'),
+        })
+    return hook
+
+
+def _decode_segment(
+    video_path: str, fps: float, sampling: str, start_frame: int, end_frame: int,
+    store_path: str
+) -> List[FrameHandle]:
+    """Worker process entry point: sample one segment of a video into a FrameStore."""
+    processor = VideoProcessor(fps=fps, sampling=sampling)
+    cap = cv2.VideoCapture(video_path)
+    
+    try:
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = max(1, int(video_fps / fps))
+        with FrameStore(store_path) as store:
+            return [
+                store.put(frame, timestamp)
+                for frame, timestamp in processor._sample_range(
+                    cap, video_fps, frame_interval, start_frame, end_frame
+                )
+            ]
+    finally:
+        cap.release()
+
+
+def _adapt_segment(
+    video_path: str, differ: Callable[[np.ndarray, np.ndarray], bool],
+    transform: Optional[Callable[[np.ndarray], np.ndarray]],
+    grid: int, coarse: int, first_position: int, last_position: int,
+    store_path: str
+) -> List[Tuple[FrameHandle, np.ndarray]]:
+    """Worker process entry point: adaptively sample one segment into a FrameStore."""
+    processor = VideoProcessor()
+    cap = cv2.VideoCapture(video_path)
+    
+    try:
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        with FrameStore(store_path) as store:
+            return [
+                (store.put(frame, timestamp), proxy)
+                for frame, timestamp, proxy in processor._adaptive_range(
+                    cap, video_fps, grid, coarse, first_position, last_position,
+                    differ, transform
+                )
+            ]
+    finally:
+        cap.release()
+
+
+def _picklable(*objects) -> bool:
+    """Whether objects can be sent to a worker process (lambdas can't)."""
+    try:
+        pickle.dumps(objects)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
@@ -8,6 +8,12 @@ import numpy as np
 import cv2
 from pathlib import Path
 import sys
+import os
+import re
+import functools
+import threading
+import time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -15,6 +21,193 @@ sys.path.insert(0, str(Path(__file__).parent))
 from services.frame_cleaner import FrameCleaner
 from services.page_detector import PageDetector
 from services.ocr_engine import OCREngine
+from services.video_processor import VideoProcessor
+from services.download_cache import DownloadCache
+from services.frame_store import FrameStore
+from services.format_selector import FormatSelector
+from services.frame_hasher import FrameHasher, hamming_distance
+from services.hash_index import HashIndex
+from services.slide_cache import SlideCache
+from services.slide_locator import SlideLocator
+
+
+def create_slide(index: int, size: tuple = (480, 640)) -> np.ndarray:
+    """Helper to create visually distinct slides for video tests"""
+    h, w = size
+    frame = np.full((h, w, 3), 255, dtype=np.uint8)
+    
+    # Move a dark block around so each slide hashes differently
+    x = (index * 150) % (w - 200)
+    y = (index * 90) % (h - 150)
+    cv2.rectangle(frame, (x, y), (x + 200, y + 150), (40, 40, 40), -1)
+    cv2.putText(frame, f"Slide {index}", (50, h - 50),
+               cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 3)
+    
+    return frame
+
+
+def create_capture(index: int, corners: list = None) -> np.ndarray:
+    """Helper to create a conference-style capture: slide inside a dark frame"""
+    frame = np.full((720, 1280, 3), 30, dtype=np.uint8)
+    slide = cv2.resize(create_slide(index), (800, 600))
+    
+    # Slide area, optionally filmed at an angle
+    corners = np.float32(corners or [[240, 60], [1040, 60], [1040, 660], [240, 660]])
+    matrix = cv2.getPerspectiveTransform(
+        np.float32([[0, 0], [800, 0], [800, 600], [0, 600]]), corners
+    )
+    inside = cv2.warpPerspective(np.full((600, 800), 255, np.uint8), matrix, (1280, 720)) > 0
+    frame[inside] = cv2.warpPerspective(slide, matrix, (1280, 720))[inside]
+    
+    # Presenter next to the screen
+    cv2.circle(frame, (1150, 500), 60, (120, 140, 180), -1)
+    return frame
+
+
+def add_face(frame: np.ndarray, center: tuple, size: int) -> np.ndarray:
+    """Helper to draw a face the Haar cascade detects, on a gray backdrop"""
+    frame = frame.copy()
+    x, y = center
+    x0, y0, x1, y1 = max(0, x - size), max(0, y - size), x + size, y + size
+    frame[y0:y1, x0:x1] = 90
+    
+    cv2.ellipse(frame, (x, y), (int(size * 0.4), int(size * 0.52)), 0, 0, 360, (200, 200, 200), -1)
+    for side in (-1, 1):
+        eye_x = x + side * int(size * 0.17)
+        cv2.ellipse(frame, (eye_x, y - int(size * 0.12)), (int(size * 0.08), int(size * 0.04)),
+                   0, 0, 360, (40, 40, 40), -1)
+        cv2.line(frame, (eye_x - int(size * 0.1), y - int(size * 0.22)),
+                (eye_x + int(size * 0.1), y - int(size * 0.22)), (40, 40, 40), max(1, size // 40))
+    cv2.line(frame, (x, y - int(size * 0.05)), (x, y + int(size * 0.12)),
+            (170, 170, 170), max(1, size // 50))
+    cv2.ellipse(frame, (x, y + int(size * 0.27)), (int(size * 0.15), int(size * 0.05)),
+               0, 0, 360, (80, 80, 80), -1)
+    
+    frame[y0:y1, x0:x1] = cv2.GaussianBlur(frame[y0:y1, x0:x1], (5, 5), 0)
+    return frame
+
+
+def write_test_video(path: Path, slides: list, seconds_per_slide: float = 3.0,
+                     fps: int = 10) -> Path:
+    """Helper to write a synthetic lecture video with one slide per segment"""
+    h, w = slides[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+    
+    for slide in slides:
+        for _ in range(int(seconds_per_slide * fps)):
+            writer.write(slide)
+    
+    writer.release()
+    return path
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler with the byte-range support real media hosts have"""
+    
+    def send_head(self):
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if not match:
+            return super().send_head()
+        
+        path = self.translate_path(self.path)
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2) or size - 1), size - 1)
+        
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        return f
+    
+    def copyfile(self, source, outputfile):
+        # The decoder hangs up as soon as it has what it needs
+        try:
+            super().copyfile(source, outputfile)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def media_server(tmp_path):
+    """Local HTTP stand-in for a video host, serving files from tmp_path"""
+    handler = functools.partial(RangeRequestHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    
+    server.shutdown()
+    server.server_close()
+
+
+class FakeYoutubeDL:
+    """
+    yt_dlp.YoutubeDL stand-in; get one through the fake_ytdl fixture.
+    
+    extract_info returns info (format_id defaults to the requested format)
+    and downloading writes video to outtmpl, reporting progress (a list of
+    downloaded_bytes values) to the progress hooks on the way. Every call
+    is recorded in calls as (method, opts).
+    """
+    info = {}
+    video = b"video"
+    progress = []
+    calls = []
+    
+    def __init__(self, opts):
+        self.opts = opts
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        pass
+    
+    def extract_info(self, url, download=False, process=True):
+        self.calls.append(("extract_info", self.opts))
+        info = {"ext": "mp4", "format_id": self.opts.get("format", "default"), **self.info}
+        if download:
+            return self._download(info)
+        return info
+    
+    def process_ie_result(self, info, download=True):
+        self.calls.append(("process_ie_result", self.opts))
+        return self._download(info) if download else info
+    
+    def prepare_filename(self, info):
+        return self.opts["outtmpl"].replace("%(ext)s", info.get("ext", "mp4"))
+    
+    def _download(self, info):
+        for downloaded in self.progress:
+            time.sleep(0.05)
+            for hook in self.opts.get("progress_hooks", []):
+                hook({"status": "downloading", "downloaded_bytes": downloaded,
+                      "total_bytes": self.progress[-1], "speed": 2000.0})
+        Path(self.prepare_filename(info)).write_bytes(self.video)
+        return info
+    
+    @classmethod
+    def options(cls, method: str) -> list:
+        """Options of every recorded call to method, in order"""
+        return [opts for called, opts in cls.calls if called == method]
+
+
+@pytest.fixture
+def fake_ytdl(monkeypatch):
+    """yt_dlp.YoutubeDL replaced by a fresh FakeYoutubeDL subclass"""
+    import yt_dlp
+    
+    fake = type("FakeYoutubeDL", (FakeYoutubeDL,), {"info": {}, "calls": []})
+    monkeypatch.setattr(yt_dlp, "YoutubeDL", fake)
+    return fake
 
 
 class TestFrameCleanerAgentic:
@@ -46,6 +239,17 @@ class TestFrameCleanerAgentic:
         
         assert self.cleaner.is_low_quality(blurry_frame) == True
     
+    @pytest.mark.parametrize("kernel", [9, 21, 41])
+    def test_low_quality_detection_blurred_text(self, kernel):
+        """Test that a blurred text slide is rejected even though its proxy looks sharp"""
+        frame = np.full((1080, 1920, 3), 200, dtype=np.uint8)
+        for i in range(6):
+            cv2.putText(frame, f"Bullet point {i} text here", (80, 120 + i * 135),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1.8, (20, 20, 20), 2)
+        
+        assert self.cleaner.is_low_quality(frame) == False
+        assert self.cleaner.is_low_quality(cv2.GaussianBlur(frame, (kernel, kernel), 0)) == True
+    
     def test_low_quality_detection_good_frame(self):
         """Test that good quality frames pass validation"""
         # Create a frame with good contrast and sharpness
@@ -97,6 +301,149 @@ class TestFrameCleanerAgentic:
         # Should detect some obstructions (faces or overlays)
         assert isinstance(obstructions, list)
     
+    def test_facecam_face_found_at_full_resolution(self):
+        """Test that a corner facecam found on the downscaled frame maps back to full size"""
+        frame = add_face(cv2.resize(create_slide(0), (1920, 1080)), (1810, 970), 100)
+        
+        faces = self.cleaner._detect_faces_haar(frame)
+        
+        assert len(faces) == 1
+        face = faces[0]
+        assert face.type == 'face'
+        assert face.x < 1810 < face.x + face.width
+        assert face.y < 970 < face.y + face.height
+        # Face plus body margin, not the whole corner
+        assert 150 < face.width < 250
+    
+    def test_presenter_face_found_outside_corners(self):
+        """Test that the full-frame pass finds a face the corner pass can't"""
+        frame = add_face(np.full((720, 1280, 3), 240, dtype=np.uint8), (640, 360), 150)
+        
+        faces = self.cleaner._detect_faces_haar(frame)
+        
+        assert len(faces) == 1
+        assert faces[0].x < 640 < faces[0].x + faces[0].width
+        assert self.cleaner._detect_faces_haar(create_slide(0)) == []
+    
+    def create_text_page(self, index: int, facecam: bool = False) -> np.ndarray:
+        """Helper to create a 720p bullet slide, optionally with a corner facecam"""
+        frame = np.full((720, 1280, 3), 235, dtype=np.uint8)
+        cv2.putText(frame, f"Topic {index}", (80, 90), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (20, 20, 20), 3)
+        for line in range(3 + index % 3):
+            cv2.putText(frame, f"Point {index}.{line} about {'x' * (index % 4 + 5)}",
+                       (100, 180 + line * 80), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (20, 20, 20), 2)
+        
+        if facecam:
+            frame = add_face(frame, (1180 + index % 2 * 5, 620), 80)
+        return frame
+    
+    def test_tracker_reuses_confirmed_facecam(self):
+        """Test that a facecam is detected on the first pages only, then reused"""
+        tracker = self.cleaner.tracker()
+        
+        for i in range(8):
+            obstructions = tracker.obstructions(self.create_text_page(i, facecam=True))
+            
+            assert [region.type for region in obstructions] == ['face']
+            assert obstructions[0].x < 1180 < obstructions[0].x + obstructions[0].width
+        
+        assert tracker.detections == tracker.SAMPLES
+        assert not tracker.provisional
+    
+    def test_tracker_redetects_when_facecam_closes(self):
+        """Test that a confirmed region that changes triggers a fresh detection"""
+        tracker = self.cleaner.tracker()
+        for i in range(3):
+            tracker.obstructions(self.create_text_page(i, facecam=True))
+        
+        assert len(tracker.regions) == 1
+        assert tracker.obstructions(self.create_text_page(3)) == []
+        assert tracker.detections == 4
+    
+    def test_tracker_finds_facecam_appearing_later(self):
+        """Test that a facecam appearing after faceless pages is still found"""
+        tracker = self.cleaner.tracker()
+        for i in range(3):
+            assert tracker.obstructions(self.create_text_page(i)) == []
+        
+        # Nothing found: the empty model is confirmed, only a corner change re-detects
+        assert tracker.regions == [] and not tracker.provisional
+        assert tracker.obstructions(self.create_text_page(3)) == []
+        assert tracker.detections == tracker.SAMPLES
+        assert len(tracker.obstructions(self.create_text_page(4, facecam=True))) == 1
+        assert tracker.detections == tracker.SAMPLES + 1
+    
+    def test_tracker_revisits_unconfirmed_detections(self, monkeypatch):
+        """Test that a facecam Haar missed on most samples is confirmed later"""
+        tracker = self.cleaner.tracker()
+        detect = self.cleaner._detect_all_obstructions
+        missed = []
+        
+        def flaky_detect(frame):
+            # Miss the face on the first two pages
+            if len(missed) < 2:
+                missed.append(frame)
+                return []
+            return detect(frame)
+        
+        monkeypatch.setattr(self.cleaner, "_detect_all_obstructions", flaky_detect)
+        
+        pages = [self.create_text_page(i, facecam=True) for i in range(10)]
+        for page in pages[:-1]:
+            tracker.obstructions(page)
+        
+        assert len(tracker.regions) == 1 and not tracker.provisional
+        assert tracker.detections == tracker.SAMPLES + 1
+        assert [region.type for region in tracker.obstructions(pages[-1])] == ['face']
+    
+    def test_tracker_drops_one_off_detections(self):
+        """Test that a face seen on a single page isn't applied to later pages"""
+        tracker = self.cleaner.tracker()
+        pages = [self.create_text_page(i) for i in range(10)]
+        pages[1] = self.create_text_page(1, facecam=True)
+        
+        assert tracker.obstructions(pages[0]) == []
+        assert len(tracker.obstructions(pages[1])) == 1
+        for page in pages[2:]:
+            assert tracker.obstructions(page) == []
+        
+        assert tracker.regions == [] and not tracker.provisional
+        assert tracker.detections == tracker.SAMPLES
+    
+    @pytest.mark.asyncio
+    async def test_analysis_shared_across_checks(self, monkeypatch):
+        """Test that one FrameAnalysis converts the frame to grayscale once"""
+        from services.frame_analysis import FrameAnalysis
+        
+        frame = np.full((720, 1280, 3), 200, dtype=np.uint8)
+        for i in range(5):
+            cv2.putText(frame, f"Bullet point {i}", (200, 150 + 80 * i),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+        
+        conversions = []
+        convert = cv2.cvtColor
+        monkeypatch.setattr(cv2, "cvtColor", lambda *args: conversions.append(1) or convert(*args))
+        
+        analysis = FrameAnalysis(frame)
+        assert self.cleaner.is_low_quality(analysis) == False
+        result = await self.cleaner.remove_obstructions(analysis)
+        self.cleaner.is_valid_cleaned_frame(analysis)
+        
+        assert result is frame
+        assert len(conversions) == 1
+        # Same verdicts as with a bare array
+        assert self.cleaner.is_low_quality(frame) == False
+    
+    def test_quality_scored_on_proxy(self):
+        """Test that quality checks accept a precomputed proxy"""
+        from services.frame_analysis import make_proxy
+        
+        good_frame = np.random.randint(50, 200, (1080, 1920, 3), dtype=np.uint8)
+        dark_frame = np.full((1080, 1920, 3), 10, dtype=np.uint8)
+        
+        assert self.cleaner.is_low_quality(good_frame, make_proxy(good_frame)) == False
+        assert self.cleaner.is_low_quality(dark_frame, make_proxy(dark_frame)) == True
+    
     def test_region_merging(self):
         """Test that overlapping regions are merged"""
         from services.frame_cleaner import ObstructionRegion
@@ -169,6 +516,166 @@ class TestPageDetector:
         # Slide 2 should be filtered out
         assert len(unique) <= 2
     
+    def create_bullet_frame(self, bullets: int, cursor: tuple = None):
+        """Helper to create a slide with a number of bullet lines"""
+        frame = np.full((720, 1280, 3), 245, dtype=np.uint8)
+        for i in range(bullets):
+            cv2.putText(frame, f"Bullet point {i * 37}", (80, 120 + i * 90),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2)
+        if cursor is not None:
+            cv2.circle(frame, cursor, 8, (0, 0, 255), -1)
+        return frame
+    
+    @pytest.mark.asyncio
+    async def test_new_bullet_is_a_new_page(self):
+        """Test that a build step too small for pHash is caught by differencing"""
+        three, four = self.create_bullet_frame(3), self.create_bullet_frame(4)
+        # pHash alone can't tell these apart
+        hashes = self.detector.hasher.hash_batch([three, four])
+        assert hamming_distance(hashes[0], hashes[1]) <= self.detector.hash_threshold
+        
+        frames = [(three, float(t)) for t in range(3)] + [(four, float(t)) for t in range(3, 6)]
+        
+        detector = PageDetector(collapse_builds=False)
+        unique = await detector.detect_unique_pages(frames)
+        
+        assert len(unique) == 2
+    
+    def test_progressive_build_collapses_to_final_state(self):
+        """Test that bullets revealed one at a time become one page"""
+        steps = [self.create_bullet_frame(n, cursor=(900, 100)) for n in range(1, 5)]
+        next_slide = self.create_test_frame("Summary")
+        next_slide = cv2.resize(next_slide, (1280, 720))
+        
+        session = self.detector.session()
+        emitted_at = []
+        for t in range(15):
+            frame = steps[t // 3] if t < 12 else next_slide
+            for page in session.push(frame, float(t)):
+                emitted_at.append((t, page))
+        emitted_at.extend(("flush", page) for page in session.flush())
+        
+        assert [(t, page.timestamp) for t, page in emitted_at] == [(12, 0.0), ("flush", 12.0)]
+        assert emitted_at[0][1].frame is steps[-1]
+    
+    @pytest.mark.asyncio
+    async def test_motion_is_not_a_new_page(self):
+        """Test that a cursor moving over the slide doesn't split the page"""
+        frames = [
+            (self.create_bullet_frame(3, cursor=(100 + 90 * t, 100 + 40 * t)), float(t))
+            for t in range(6)
+        ]
+        
+        unique = await self.detector.detect_unique_pages(frames)
+        
+        assert len(unique) == 1
+    
+    def test_session_emits_pages_while_streaming(self):
+        """Test that push() hands over each page as soon as the next one starts"""
+        slides = [create_slide(i) for i in range(3)]
+        session = self.detector.session()
+        
+        emitted_at = []
+        for t in range(9):
+            for page in session.push(slides[t // 3], float(t)):
+                emitted_at.append((t, page.timestamp))
+        for page in session.flush():
+            emitted_at.append(("flush", page.timestamp))
+        
+        # Pages 1 and 2 are out before the video ends
+        assert emitted_at == [(3, 0.0), (6, 3.0), ("flush", 6.0)]
+    
+    def test_session_dedupes_revisited_pages(self):
+        """Test that a session can drop pages seen earlier in the video"""
+        slides = [create_slide(0), create_slide(1), create_slide(0)]
+        session = self.detector.session(dedupe_threshold=5)
+        
+        pages = []
+        for t in range(9):
+            pages.extend(session.push(slides[t // 3], float(t)))
+        pages.extend(session.flush())
+        
+        assert [page.timestamp for page in pages] == [0.0, 3.0]
+        assert isinstance(pages[0].hash_value, int)
+    
+    def test_session_keeps_sharpest_frame_of_page(self):
+        """Test that a blurred or fading sample never replaces a sharp one"""
+        sharp, next_slide = create_slide(0), create_slide(1)
+        blurred = cv2.GaussianBlur(sharp, (5, 5), 0)
+        faded = (sharp * 0.06).astype(np.uint8)
+        
+        session = self.detector.session()
+        pages = []
+        for t, frame in enumerate([blurred, sharp, blurred, faded] + [next_slide] * 3):
+            pages.extend(session.push(frame, float(t)))
+        pages.extend(session.flush())
+        
+        assert len(pages) == 2
+        assert pages[0].frame is sharp
+        assert pages[0].timestamp == 0.0
+        assert not FrameCleaner().is_low_quality(pages[0].frame)
+    
+    def add_facecam(self, frame: np.ndarray, seed: int) -> np.ndarray:
+        """Helper to paste a facecam into the bottom-right corner"""
+        frame = frame.copy()
+        frame[360:, 480:] = 90
+        # The head moves around inside the facecam
+        rng = np.random.default_rng(seed)
+        center = (int(rng.integers(520, 600)), int(rng.integers(400, 440)))
+        cv2.circle(frame, center, 35, (170, 190, 230), -1)
+        return frame
+    
+    def test_facecam_masked_out_of_page_detection(self):
+        """Test that a changing facecam doesn't split a slide into many pages"""
+        slides = [create_slide(0), create_slide(1)]
+        # The presenter moves, then holds still for a moment
+        frames = [self.add_facecam(slides[t // 6], seed=t * 2 // 3) for t in range(12)]
+        
+        mask = self.detector.estimate_slide_mask(list(zip(frames[:-1], frames[1:])))
+        
+        assert mask is not None
+        assert not mask[-1, -1] and mask[0, 0] and mask[8, 8]
+        
+        def detect(mask):
+            session = self.detector.session(mask=mask)
+            pages = []
+            for t, frame in enumerate(frames):
+                pages.extend(session.push(frame, float(t)))
+            return pages + session.flush()
+        
+        assert len(detect(None)) > 2
+        assert [page.timestamp for page in detect(mask)] == [0.0, 6.0]
+        assert not self.detector.is_page_change(frames[0], frames[1], mask=mask)
+    
+    def test_static_video_needs_no_mask(self):
+        """Test that slides without dynamic regions aren't masked"""
+        frames = [create_slide(t // 6) for t in range(18)]
+        
+        assert self.detector.estimate_slide_mask(list(zip(frames[:-1], frames[1:]))) is None
+    
+    def test_remove_duplicates_drops_revisited_slides(self):
+        """Test that a slide shown again later is only kept once"""
+        slides = [create_slide(i) for i in range(3)]
+        
+        unique = self.detector.remove_duplicates_by_similarity(
+            [slides[0], slides[1], slides[0].copy(), slides[2], slides[1].copy()]
+        )
+        
+        assert len(unique) == 3
+        assert unique[2] is slides[2]
+    
+    def test_phash_on_proxy_matches_full_frame(self):
+        """Test that hashing the proxy agrees with hashing the full frame"""
+        from services.frame_analysis import make_proxy
+        
+        frame = cv2.resize(self.create_test_frame("Proxy"), (1920, 1080))
+        proxy = make_proxy(frame)
+        
+        assert proxy.ndim == 2
+        assert proxy.shape[1] <= 320
+        assert make_proxy(proxy) is proxy
+        assert self.detector._calculate_phash(frame) - self.detector._calculate_phash(proxy) == 0
+    
     def test_phash_calculation(self):
         """Test perceptual hash calculation"""
         frame1 = self.create_test_frame("Test")
@@ -186,6 +693,996 @@ class TestPageDetector:
         assert hash1 - hash3 > 5
 
 
+class TestFrameHasher:
+    """Test vectorized batch hashing"""
+    
+    def test_phash_agrees_with_imagehash(self):
+        """Test that batched pHash stays within a few bits of imagehash"""
+        import imagehash
+        from PIL import Image
+        from services.frame_analysis import make_proxy
+        
+        proxies = [make_proxy(create_slide(i, size=(720, 1280))) for i in range(8)]
+        hashes = FrameHasher("phash").hash_batch(proxies)
+        
+        assert hashes.dtype == np.uint64
+        assert hashes.shape == (8,)
+        for proxy, value in zip(proxies, hashes):
+            reference = int(str(imagehash.phash(Image.fromarray(proxy), hash_size=8)), 16)
+            assert hamming_distance(value, reference) <= 4
+    
+    @pytest.mark.parametrize("method", ["phash", "dhash", "ahash"])
+    def test_methods_separate_slides(self, method):
+        """Test that each method tells slides apart but not identical frames"""
+        slides = [create_slide(i) for i in range(4)]
+        hasher = FrameHasher(method)
+        
+        hashes = hasher.hash_batch(slides + [slides[0].copy()])
+        
+        assert hamming_distance(hashes[0], hashes[4]) == 0
+        assert (hamming_distance(hashes[0], hashes[1:4]) > 5).all()
+        assert hasher.hash(slides[1]) == hashes[1]
+    
+    def test_hamming_distance_broadcasts(self):
+        """Test scalar and vectorized popcount Hamming distance"""
+        values = np.array([0, 1, 0xFF, 2 ** 64 - 1], dtype=np.uint64)
+        
+        assert hamming_distance(0, 0b1011) == 3
+        assert hamming_distance(0, values).tolist() == [0, 1, 8, 64]
+        assert FrameHasher().hash_batch([]).shape == (0,)
+        
+        with pytest.raises(ValueError):
+            FrameHasher("bogus")
+
+
+class TestHashIndex:
+    """Test multi-index Hamming search over packed hashes"""
+    
+    @pytest.mark.parametrize("radius", [3, 5, 20])
+    def test_query_matches_brute_force(self, radius):
+        """Test that indexed search finds exactly the pages a full scan finds"""
+        rng = np.random.default_rng(radius)
+        stored = rng.integers(0, 2 ** 63, 500, dtype=np.uint64)
+        # Near neighbours of stored hashes, a few bits flipped
+        flips = [1 << int(b) for b in rng.integers(0, 64, 300)]
+        queries = [int(stored[i % 500]) ^ flips[i] ^ flips[(i * 7) % 300] for i in range(300)]
+        
+        index = HashIndex(max_distance=radius)
+        for value in stored:
+            index.add(value)
+        
+        for query in queries:
+            distances = hamming_distance(query, stored)
+            expected = set(np.flatnonzero(distances <= radius).tolist())
+            found = index.query(query)
+            
+            assert {record.page_id for record, _ in found} == expected
+            assert [d for _, d in found] == sorted(d for _, d in found)
+    
+    def test_records_are_compact(self):
+        """Test that page records carry no per-instance dict"""
+        record = HashIndex().add(0xABC, timestamp=4.0)
+        
+        assert not hasattr(record, "__dict__")
+        assert record.page_id == 0
+        assert HashIndex().nearest(0xABC) is None
+
+
+class TestSlideCache:
+    """Test the persistent cross-video slide cache"""
+    
+    def create_text_slide(self, text: str):
+        """Helper to create a slide that differs from others only in text"""
+        frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+        cv2.putText(frame, text, (100, 240), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 3)
+        return frame
+    
+    def test_slides_persist_across_instances(self, tmp_path):
+        """Test that a slide stored by one job is found by a later one"""
+        slide = create_slide(0)
+        cache = SlideCache(tmp_path / "slides.db")
+        cache.put(cache.key(slide), slide, "Slide 0 text")
+        cache.close()
+        
+        cache = SlideCache(tmp_path / "slides.db")
+        image, text = cache.get(cache.key(slide))
+        
+        assert text == "Slide 0 text"
+        assert np.array_equal(image, slide)
+    
+    def create_lecture_slide(self, index: int):
+        """Helper to create a 1080p bullet slide, some with a picture"""
+        frame = np.full((1080, 1920, 3), 245, dtype=np.uint8)
+        cv2.putText(frame, f"Lecture topic {index}", (90, 135), cv2.FONT_HERSHEY_SIMPLEX, 2.4, (30, 30, 30), 4)
+        for line in range(2 + index % 4):
+            cv2.putText(frame, f"- point {line} on subject {index * 7 + line}", (135, 285 + line * 135),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1.6, (30, 30, 30), 3)
+        if index % 3 == 0:
+            cv2.rectangle(frame, (1200, 300), (1770, 840), (60, 120, 200), -1)
+        return frame
+    
+    def test_reencoded_slide_hits(self, tmp_path):
+        """Test that the same slide at another resolution and bitrate matches"""
+        slides = [self.create_lecture_slide(i) for i in range(20)]
+        cache = SlideCache(tmp_path / "slides.db")
+        for i, slide in enumerate(slides):
+            cache.put(cache.key(slide), slide, f"text {i}")
+        
+        distances = []
+        for i, slide in enumerate(slides):
+            small = cv2.resize(slide, (1280, 720), interpolation=cv2.INTER_AREA)
+            _, jpeg = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, 50])
+            key = cache.key(cv2.imdecode(jpeg, cv2.IMREAD_COLOR))
+            distances.append(bin((key[0] ^ cache.key(slide)[0]) & (2 ** 64 - 1)).count("1"))
+            
+            _, text = cache.get(key)
+            assert text == f"text {i}"
+        
+        # Some re-encodes don't hash exactly alike
+        assert max(distances) > 0
+    
+    def test_masked_key_ignores_facecam(self, tmp_path):
+        """Test that keys on the slide-masked proxy match whatever the facecam shows"""
+        from services.frame_analysis import make_proxy
+        
+        slide = self.create_lecture_slide(1)
+        first, second = slide.copy(), slide.copy()
+        first[810:, 1440:] = 90
+        second[810:, 1440:] = 60
+        cv2.circle(first, (1680, 950), 90, (170, 190, 230), -1)
+        cv2.circle(second, (1600, 930), 110, (150, 170, 220), -1)
+        
+        mask = np.ones((16, 16), dtype=bool)
+        mask[-5:, -5:] = False
+        key = lambda frame: cache.key(PageDetector().apply_mask(make_proxy(frame), mask))
+        
+        cache = SlideCache(tmp_path / "slides.db")
+        cache.put(key(first), first, "text")
+        
+        assert cache.get(key(second)) is not None
+        assert cache.get(cache.key(second)) is None
+    
+    def test_lookalike_slide_misses(self, tmp_path):
+        """Test that slides differing in one word don't share an entry"""
+        one, two = self.create_text_slide("Slide 1"), self.create_text_slide("Slide 2")
+        cache = SlideCache(tmp_path / "slides.db")
+        cache.put(cache.key(one), one, "Slide 1")
+        
+        assert cache.get(cache.key(two)) is None
+    
+    def test_least_recently_used_slides_evicted(self, tmp_path):
+        """Test that the size cap evicts the slide unused the longest"""
+        slides = [create_slide(i) for i in range(3)]
+        cache = SlideCache(tmp_path / "slides.db")
+        for slide in slides[:2]:
+            cache.put(cache.key(slide), slide, "text")
+        cache.get(cache.key(slides[0]))
+        
+        # Room for the slide just used and the new one
+        cache.max_bytes = sum(len(cv2.imencode(".png", slide)[1]) for slide in (slides[0], slides[2]))
+        cache.put(cache.key(slides[2]), slides[2], "text")
+        
+        assert len(cache) == 2
+        assert cache.get(cache.key(slides[0])) is not None
+        assert cache.get(cache.key(slides[1])) is None
+
+
+class TestSlideLocator:
+    """Test finding the slide area inside a larger frame"""
+    
+    def setup_method(self):
+        self.locator = SlideLocator()
+    
+    def test_slide_rectangle_cropped(self):
+        """Test that a stable slide rectangle is found and cut out as a view"""
+        frames = [create_capture(i) for i in range(5)]
+        
+        quad = self.locator.locate(frames)
+        
+        assert quad is not None
+        assert np.allclose(quad[0], [240 / 1280, 60 / 720], atol=0.01)
+        assert np.allclose(quad[2], [1040 / 1280, 660 / 720], atol=0.01)
+        
+        slide = self.locator.warp(frames[0], quad)
+        assert abs(slide.shape[1] - 800) <= 12 and abs(slide.shape[0] - 600) <= 12
+        assert slide.base is not None
+        # Works the same on proxies
+        proxy = self.locator.warp(cv2.resize(frames[0], (320, 180)), quad)
+        assert abs(proxy.shape[1] / proxy.shape[0] - 4 / 3) < 0.05
+    
+    def test_angled_slide_warped(self):
+        """Test that a slide filmed at an angle is warped back to a rectangle"""
+        corners = [[220, 90], [1020, 120], [1000, 640], [200, 610]]
+        frames = [create_capture(i, corners) for i in range(5)]
+        
+        quad = self.locator.locate(frames)
+        slide = self.locator.warp(frames[0], quad)
+        
+        assert np.allclose(quad * [1280, 720], corners, atol=12)
+        assert slide.base is None
+        assert 750 <= slide.shape[1] <= 830
+    
+    def test_full_frame_slides_not_cropped(self):
+        """Test that nothing is cropped when the slide fills the frame"""
+        assert self.locator.locate([create_slide(i) for i in range(5)]) is None
+        assert self.locator.transform(None) is None
+    
+    def test_template_content_box_not_cropped(self):
+        """Test that a bordered content box drawn on every slide isn't taken as the slide"""
+        frames = []
+        for i in range(5):
+            frame = np.full((720, 1280, 3), 250, dtype=np.uint8)
+            cv2.putText(frame, f"Section {i} title", (60, 70), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (20, 20, 20), 3)
+            cv2.rectangle(frame, (50, 100), (1230, 685), (120, 60, 20), 3)
+            for line in range(4):
+                cv2.putText(frame, f"Bullet {i}.{line}", (100, 200 + line * 110),
+                           cv2.FONT_HERSHEY_SIMPLEX, 1.4, (20, 20, 20), 2)
+            frames.append(frame)
+        
+        assert self.locator._find_quad(frames[0]) is None
+        assert self.locator.locate(frames) is None
+    
+    def test_passing_rectangle_ignored(self):
+        """Test that a rectangle seen in only one sample isn't taken as the slide"""
+        frames = [np.full((720, 1280, 3), 30, dtype=np.uint8) for _ in range(4)]
+        frames.append(create_capture(0))
+        
+        assert self.locator.locate(frames) is None
+
+
+class TestVideoProcessor:
+    """Test frame extraction from video files"""
+    
+    def setup_method(self):
+        self.processor = VideoProcessor(fps=1)
+    
+    def test_iter_frames_is_lazy(self, tmp_path):
+        """Test that frames are yielded one at a time at the requested rate"""
+        slides = [create_slide(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        
+        frames = self.processor.iter_frames(video_path)
+        
+        # Should be a generator, not a materialized list
+        assert not isinstance(frames, list)
+        
+        timestamps = [timestamp for _, timestamp in frames]
+        assert timestamps == [float(t) for t in range(9)]
+    
+    @pytest.mark.asyncio
+    async def test_streamed_frames_feed_page_detector(self, tmp_path):
+        """Test that the page detector consumes a frame stream directly"""
+        slides = [create_slide(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        detector = PageDetector(min_page_duration=2.0)
+        
+        unique = await detector.detect_unique_pages(
+            self.processor.stream_frames(video_path, with_proxy=True)
+        )
+        
+        assert len(unique) == 3
+        # Full-resolution frames come out, not proxies
+        assert unique[0].shape == slides[0].shape
+    
+    @pytest.mark.parametrize("mode", ["grab", "seek"])
+    def test_sampling_modes_match_full_decode(self, tmp_path, mode):
+        """Test that grab/seek sampling returns the same frames as read()"""
+        slides = [create_slide(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        
+        reference = list(VideoProcessor(fps=0.5, sampling="read").iter_frames(video_path))
+        sampled = list(VideoProcessor(fps=0.5, sampling=mode).iter_frames(video_path))
+        
+        assert [t for _, t in sampled] == [t for _, t in reference]
+        for (frame, _), (expected, _) in zip(sampled, reference):
+            assert np.array_equal(frame, expected)
+    
+    def test_auto_sampling_seeks_for_sparse_rates(self):
+        """Test that auto mode only seeks when samples are far apart"""
+        assert VideoProcessor(fps=0.5)._resolve_sampling(2.0) == "seek"
+        assert VideoProcessor(fps=1)._resolve_sampling(1.0) == "grab"
+        
+        with pytest.raises(ValueError):
+            VideoProcessor(sampling="bogus")
+    
+    def test_keyframe_sampling(self, tmp_path):
+        """Test that keyframe mode decodes only I-frames at most 1/fps apart"""
+        av = pytest.importorskip("av")
+        slides = [create_slide(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        
+        with av.open(str(video_path)) as container:
+            stream = container.streams.video[0]
+            keyframe_times = {
+                round(float(p.pts * stream.time_base), 3)
+                for p in container.demux(stream) if p.is_keyframe
+            }
+        
+        timestamps = [t for _, t in VideoProcessor(sampling="keyframe").iter_frames(video_path)]
+        
+        assert timestamps
+        assert all(round(t, 3) in keyframe_times for t in timestamps)
+        assert all(b - a >= 1.0 for a, b in zip(timestamps, timestamps[1:]))
+    
+    def test_keyframe_sampling_falls_back_when_sparse(self, tmp_path):
+        """Test fallback to interval sampling when keyframes are too far apart"""
+        slides = [create_slide(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        
+        processor = VideoProcessor(fps=1, sampling="keyframe")
+        processor.KEYFRAME_MAX_GAP = 0.01
+        
+        timestamps = [t for _, t in processor.iter_frames(video_path)]
+        assert timestamps == [float(t) for t in range(9)]
+    
+    def test_parallel_decoding_matches_sequential(self, tmp_path, monkeypatch):
+        """Test that segmented multi-process decoding merges back in order"""
+        import tempfile
+        slides = [create_slide(i) for i in range(6)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        monkeypatch.setattr(tempfile, "tempdir", str(scratch))
+        
+        sequential = list(self.processor.iter_frames(video_path))
+        
+        parallel_processor = VideoProcessor(fps=1, workers=2)
+        parallel_processor.PARALLEL_SEGMENT_SECONDS = 4.0
+        parallel = list(parallel_processor.iter_frames(video_path))
+        
+        assert [t for _, t in parallel] == [t for _, t in sequential]
+        for (frame, _), (expected, _) in zip(parallel, sequential):
+            assert np.array_equal(frame, expected)
+        # Segment frame stores are gone once merged
+        assert list(scratch.iterdir()) == []
+    
+    def test_progressive_decoding_from_http(self, tmp_path, media_server):
+        """Test that frames decode straight from a media URL, no temp file"""
+        slides = [create_slide(i) for i in range(3)]
+        write_test_video(tmp_path / "lecture.mp4", slides)
+        
+        local = list(self.processor.iter_frames(tmp_path / "lecture.mp4"))
+        remote = list(self.processor.iter_frames(f"{media_server}/lecture.mp4"))
+        
+        assert [t for _, t in remote] == [t for _, t in local]
+        for (frame, _), (expected, _) in zip(remote, local):
+            assert np.array_equal(frame, expected)
+    
+    @pytest.mark.asyncio
+    async def test_resolve_stream_url_rejects_fragmented_formats(self, fake_ytdl):
+        """Test that only single-file HTTP formats are used for streaming"""
+        fake_ytdl.info = {"protocol": "https", "url": "https://cdn/video.mp4"}
+        assert await self.processor.resolve_stream_url("u", "720p") == "https://cdn/video.mp4"
+        
+        fake_ytdl.info = {"protocol": "http_dash_segments", "url": "https://cdn/manifest"}
+        assert await self.processor.resolve_stream_url("u", "720p") is None
+    
+    @pytest.mark.parametrize("mode", ["grab", "seek", "keyframe"])
+    def test_time_range_limits_decoding(self, tmp_path, mode):
+        """Test that start/end sample only the frames a full pass has in range"""
+        if mode == "keyframe":
+            pytest.importorskip("av")
+        slides = [create_slide(i) for i in range(4)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        processor = VideoProcessor(fps=1, sampling=mode)
+        
+        full = [t for _, t in processor.iter_frames(video_path)]
+        ranged = [t for _, t in processor.iter_frames(video_path, start=2.5, end=7.0)]
+        
+        assert ranged == [t for t in full if 2.5 <= t < 7.0]
+        assert ranged
+    
+    def test_time_range_adaptive(self, tmp_path):
+        """Test that adaptive sampling stays inside the requested range"""
+        slides = [create_slide(i) for i in range(4)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        detector = PageDetector()
+        
+        samples = list(self.processor.iter_frames(
+            video_path, differ=detector.is_page_change, start=3.0, end=9.0
+        ))
+        
+        timestamps = [t for _, t in samples]
+        assert timestamps[0] == 3.0
+        assert max(timestamps) < 9.0
+    
+    @pytest.mark.asyncio
+    async def test_download_off_event_loop_reports_bytes(self, tmp_path, fake_ytdl):
+        """Test that downloads don't block the loop and report byte progress"""
+        import asyncio
+        fake_ytdl.progress = [0, 500, 1000]
+        
+        updates = []
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        
+        task = asyncio.create_task(ticker())
+        video_path = await self.processor.download_video(
+            "u", "720p", tmp_path / "job", progress=updates.append
+        )
+        task.cancel()
+        
+        assert video_path == tmp_path / "job" / "video.mp4"
+        assert ticks > 5
+        assert [u["downloaded_bytes"] for u in updates] == [0, 500, 1000]
+        assert updates[-1]["total_bytes"] == 1000
+        assert updates[-1]["speed"] == 2000.0
+    
+    @pytest.mark.asyncio
+    async def test_resolve_chapter(self, fake_ytdl):
+        """Test chapter lookup by title and by number"""
+        fake_ytdl.info = {"chapters": [
+            {"title": "Intro", "start_time": 0.0, "end_time": 60.0},
+            {"title": "Eigenvalues", "start_time": 60.0, "end_time": 900.0},
+        ]}
+        
+        assert await self.processor.resolve_chapter("u", "eigenvalues") == (60.0, 900.0)
+        assert await self.processor.resolve_chapter("u", "1") == (0.0, 60.0)
+        with pytest.raises(ValueError):
+            await self.processor.resolve_chapter("u", "Outro")
+    
+    @pytest.mark.asyncio
+    async def test_adaptive_sampling_pins_transitions(self, tmp_path):
+        """Test coarse probing + bisection finds the same boundaries with fewer decodes"""
+        slides = [create_slide(i) for i in range(4)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides, seconds_per_slide=6.0)
+        detector = PageDetector(min_page_duration=2.0)
+        
+        uniform = list(self.processor.iter_frames(video_path))
+        adaptive = list(self.processor.iter_frames(
+            video_path, with_proxy=True, differ=detector.is_page_change
+        ))
+        timestamps = [t for _, t, _ in adaptive]
+        
+        assert len(adaptive) < len(uniform)
+        assert timestamps == sorted(timestamps)
+        # Each slide change is sampled exactly when it happens
+        for change in (6.0, 12.0, 18.0):
+            assert change in timestamps
+        
+        unique = await detector.detect_unique_pages(adaptive)
+        assert len(unique) == 4
+    
+    def test_parallel_adaptive_sampling_matches_sequential(self, tmp_path):
+        """Test that adaptive sampling on worker processes merges back unchanged"""
+        slides = [create_slide(i) for i in range(4)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides, seconds_per_slide=6.0)
+        detector = PageDetector(min_page_duration=2.0)
+        
+        sequential = list(self.processor.iter_frames(
+            video_path, with_proxy=True, differ=detector.is_page_change
+        ))
+        
+        parallel_processor = VideoProcessor(fps=1, workers=2)
+        parallel_processor.PARALLEL_SEGMENT_SECONDS = 5.0
+        parallel = list(parallel_processor.iter_frames(
+            video_path, with_proxy=True, differ=detector.is_page_change
+        ))
+        # A lambda can't reach the workers, so it is sampled in-process
+        in_process = list(parallel_processor.iter_frames(
+            video_path, differ=lambda a, b: detector.is_page_change(a, b)
+        ))
+        
+        assert [t for _, t, _ in parallel] == [t for _, t, _ in sequential]
+        assert [t for _, t in in_process] == [t for _, t, _ in sequential]
+        for (frame, _, proxy), (expected, _, expected_proxy) in zip(parallel, sequential):
+            assert np.array_equal(frame, expected)
+            assert np.array_equal(proxy, expected_proxy)
+    
+    def test_iter_frames_invalid_path(self, tmp_path):
+        """Test that unreadable videos raise a clear error"""
+        with pytest.raises(ValueError):
+            next(self.processor.iter_frames(tmp_path / "missing.mp4"))
+    
+    def test_duration(self, tmp_path):
+        """Test that the video length is read from the container"""
+        video_path = write_test_video(tmp_path / "test.mp4", [create_slide(0), create_slide(1)])
+        
+        assert self.processor.duration(video_path) == pytest.approx(6.0)
+    
+    def test_sample_proxy_pairs(self, tmp_path):
+        """Test that mask estimation input is a few proxy pairs a second apart"""
+        video_path = write_test_video(tmp_path / "lecture.mp4", [create_slide(i) for i in range(4)])
+        
+        pairs = VideoProcessor().sample_proxy_pairs(video_path, gap=1.0, spacing=2.0, start=3.0)
+        
+        # Starts at 3, 5, 7 and 9 s leave room for the second frame
+        assert len(pairs) == 4
+        assert all(a.ndim == 2 and a.shape == b.shape for a, b in pairs)
+        assert VideoProcessor().sample_proxy_pairs(video_path, start=11.5) == []
+
+
+class TestFrameStore:
+    """Test the memory-mapped on-disk frame store"""
+    
+    def test_roundtrip_is_zero_copy(self, tmp_path):
+        """Test that stored frames read back as read-only memory maps"""
+        frames = [create_slide(i) for i in range(3)]
+        
+        with FrameStore(tmp_path / "frames.bin") as store:
+            handles = [store.put(frame, timestamp=float(i)) for i, frame in enumerate(frames)]
+            gray = store.put(cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY), page_id=0)
+            
+            assert len(store) == 4
+            for handle, frame in zip(handles, frames):
+                view = store.get(handle)
+                assert isinstance(view, np.memmap)
+                assert not view.flags.writeable
+                assert np.array_equal(view, frame)
+            
+            assert store.get(gray).shape == frames[0].shape[:2]
+            assert [h.page_id for h in store] == [0, 1, 2, 0]
+    
+    def test_open_existing_store(self, tmp_path):
+        """Test that a store filled elsewhere (e.g. a worker) reads back from its index"""
+        frames = [create_slide(i) for i in range(3)]
+        with FrameStore(tmp_path / "frames.bin") as store:
+            handles = [store.put(frame, timestamp=float(i)) for i, frame in enumerate(frames)]
+        
+        with FrameStore(tmp_path / "frames.bin", index=handles) as store:
+            assert len(store) == 3
+            assert np.array_equal(store.get(handles[2]), frames[2])
+            # Appending continues after the existing frames
+            extra = store.put(frames[0])
+            assert extra.offset == handles[2].offset + frames[2].nbytes
+            assert np.array_equal(store.get(extra), frames[0])
+            assert np.array_equal(store.get(handles[1]), frames[1])
+    
+    @pytest.mark.skipif(not Path("/proc/self/fd").exists(), reason="needs /proc")
+    def test_views_share_one_mapping(self, tmp_path):
+        """Test that holding many views doesn't hold a file descriptor each"""
+        frame = cv2.resize(create_slide(0), (1920, 1080))
+        
+        with FrameStore(tmp_path / "frames.bin") as store:
+            open_fds = len(os.listdir("/proc/self/fd"))
+            views = []
+            for i in range(50):
+                views.append(store.get(store.put(frame, timestamp=float(i))))
+            
+            # 50 x 6 MB grows the file a few times, each needing a new mapping
+            assert len(os.listdir("/proc/self/fd")) - open_fds <= 5
+            assert np.array_equal(views[0], frame) and np.array_equal(views[-1], frame)
+            assert not views[-1].flags.writeable
+    
+    @pytest.mark.asyncio
+    async def test_detector_writes_pages_to_store(self, tmp_path):
+        """Test that detected pages are passed on as handles"""
+        frames = [(create_slide(i // 3), float(i)) for i in range(9)]
+        detector = PageDetector(min_page_duration=2.0)
+        
+        with FrameStore(tmp_path / "frames.bin") as store:
+            pages = await detector.detect_unique_pages(frames, store=store)
+            
+            assert len(pages) == 3
+            # Each page is stamped with the time it first appeared
+            assert [page.timestamp for page in pages] == [0.0, 3.0, 6.0]
+            assert np.array_equal(store.get(pages[1]), create_slide(1))
+
+
+class TestDownloadCache:
+    """Test the persistent video download cache"""
+    
+    def add_entry(self, cache: DownloadCache, key: str, size: int) -> Path:
+        """Helper to simulate a completed download"""
+        entry = cache.entry_dir(key)
+        entry.mkdir(parents=True)
+        (entry / "video.mp4").write_bytes(b"\0" * size)
+        cache.commit(key)
+        return entry / "video.mp4"
+    
+    def test_lru_eviction_skips_referenced_entries(self, tmp_path):
+        """Test that eviction is LRU but never removes videos in use"""
+        cache = DownloadCache(tmp_path, max_bytes=250)
+        
+        cache.acquire("a")
+        self.add_entry(cache, "a", 100)
+        self.add_entry(cache, "b", 100)
+        os.utime(cache.entry_dir("b") / DownloadCache.COMPLETE_MARKER, (1, 1))
+        self.add_entry(cache, "c", 100)
+        
+        # "a" is oldest-but-referenced, so "b" (least recently used) goes
+        assert cache.lookup("a") is not None
+        assert cache.lookup("b") is None
+        assert cache.lookup("c") is not None
+        
+        # File timestamps are coarse; make "a" explicitly the oldest again
+        os.utime(cache.entry_dir("a") / DownloadCache.COMPLETE_MARKER, (2, 2))
+        cache.release("a")
+        self.add_entry(cache, "d", 100)
+        assert cache.lookup("a") is None
+    
+    def test_incomplete_entries_are_removed(self, tmp_path):
+        """Test that leftovers of failed downloads are cleaned up"""
+        cache = DownloadCache(tmp_path)
+        cache.entry_dir("broken").mkdir()
+        (cache.entry_dir("broken") / "video.mp4.part").write_bytes(b"\0")
+        
+        cache.evict()
+        
+        assert not cache.entry_dir("broken").exists()
+    
+    @pytest.mark.asyncio
+    async def test_repeat_download_skips_network(self, tmp_path, fake_ytdl):
+        """Test that a second extraction of the same video is a cache hit"""
+        fake_ytdl.info = {"id": "lecture42", "format_id": "136+140"}
+        processor = VideoProcessor(cache=DownloadCache(tmp_path / "cache"))
+        
+        first = await processor.download_video("u", "720p", tmp_path / "job1")
+        second = await processor.download_video("u", "720p", tmp_path / "job2")
+        
+        assert first == second
+        assert first.read_bytes() == b"video"
+        assert len(fake_ytdl.options("process_ie_result")) == 1
+        
+        processor.release_video(first)
+        processor.release_video(second)
+        assert processor.cache._refs == {}
+    
+    @pytest.mark.asyncio
+    async def test_repeat_download_skips_format_probing(self, tmp_path, fake_ytdl):
+        """Test that a cached video isn't probed for legibility again"""
+        fake_ytdl.info = {"id": "lecture42"}
+        
+        class CountingSelector:
+            calls = 0
+            async def select(self, info, max_height):
+                self.calls += 1
+                return {"format_id": "134", "height": 360}
+        
+        selector = CountingSelector()
+        processor = VideoProcessor(cache=DownloadCache(tmp_path / "cache"), format_selector=selector)
+        
+        first = await processor.download_video("u", "720p", tmp_path / "job1")
+        second = await processor.download_video("u", "720p", tmp_path / "job2")
+        
+        assert first == second
+        assert selector.calls == 1
+        # Metadata is fetched once per download and reused for the download
+        assert len(fake_ytdl.options("extract_info")) == 2
+        # Another quality limit is its own entry, probed again
+        await processor.download_video("u", "1080p", tmp_path / "job3")
+        assert selector.calls == 2
+    
+    @pytest.mark.asyncio
+    async def test_time_range_downloads_section(self, tmp_path, monkeypatch, fake_ytdl):
+        """Test that a time range is downloaded as its own cache entry"""
+        fake_ytdl.info = {"id": "lecture42", "format_id": "136"}
+        monkeypatch.setattr(VideoProcessor, "supports_sections", True)
+        processor = VideoProcessor(cache=DownloadCache(tmp_path / "cache"))
+        
+        full = await processor.download_video("u", "720p", tmp_path / "job1")
+        section = await processor.download_video("u", "720p", tmp_path / "job2", 60, 120)
+        
+        assert full != section
+        options = fake_ytdl.options("process_ie_result")
+        assert "download_ranges" not in options[0]
+        assert "download_ranges" in options[1]
+
+
+class TestFormatSelector:
+    """Test legibility-aware format selection"""
+    
+    class FakeOCR:
+        """OCR stand-in that can only read frames at least 480 px tall"""
+        async def extract_text_with_confidence(self, frame):
+            return "Slide", 0.9 if frame.shape[0] >= 480 else 0.3
+    
+    def make_info(self, tmp_path):
+        """yt-dlp style info whose format URLs are local test videos"""
+        formats = []
+        for height, width in ((240, 320), (480, 640), (720, 960)):
+            slides = [create_slide(i, size=(height, width)) for i in range(2)]
+            path = write_test_video(tmp_path / f"{height}.mp4", slides)
+            formats.append({"format_id": f"v{height}", "height": height, "url": str(path),
+                            "vcodec": "mp4v", "acodec": "none", "protocol": "https"})
+        
+        # Muxed format with audio, and an audio-only format: never preferred
+        formats.append({"format_id": "muxed240", "height": 240, "url": "x", "tbr": 1,
+                        "vcodec": "mp4v", "acodec": "aac", "protocol": "https"})
+        formats.append({"format_id": "audio", "url": "x", "vcodec": "none",
+                        "acodec": "aac", "protocol": "https"})
+        return {"duration": 6, "formats": formats}
+    
+    def test_candidates_video_only_lowest_first(self, tmp_path):
+        """Test that one video-only format per height is probed, low to high"""
+        selector = FormatSelector(self.FakeOCR())
+        
+        candidates = selector.candidates(self.make_info(tmp_path), max_height=480)
+        
+        assert [f["format_id"] for f in candidates] == ["v240", "v480"]
+    
+    @pytest.mark.asyncio
+    async def test_escalates_until_legible(self, tmp_path):
+        """Test that the lowest resolution OCR can read is chosen"""
+        info = self.make_info(tmp_path)
+        
+        chosen = await FormatSelector(self.FakeOCR()).select(info, max_height=720)
+        assert chosen["format_id"] == "v480"
+        
+        lenient = FormatSelector(self.FakeOCR(), min_confidence=0.2)
+        assert (await lenient.select(info, max_height=720))["format_id"] == "v240"
+    
+    @pytest.mark.asyncio
+    async def test_falls_back_without_ocr(self, tmp_path):
+        """Test that a missing OCR binary defers to the default format"""
+        class MissingOCR:
+            async def extract_text_with_confidence(self, frame):
+                raise OSError("tesseract is not installed")
+        
+        selector = FormatSelector(MissingOCR())
+        
+        assert await selector.select(self.make_info(tmp_path), max_height=720) is None
+
+
+class TestLocalIngestion:
+    """Test local-path and upload extraction endpoints"""
+    
+    @pytest.fixture
+    def api(self, monkeypatch):
+        """Test client with the processing pipeline replaced by a recorder"""
+        from fastapi.testclient import TestClient
+        import main
+        
+        calls = []
+        
+        async def record(**kwargs):
+            calls.append(kwargs)
+        
+        monkeypatch.setattr(main, "process_video", record)
+        return TestClient(main.app), calls
+    
+    def test_local_path_decoded_in_place(self, api, tmp_path, monkeypatch):
+        """Test that a readable local file is passed through without copying"""
+        client, calls = api
+        video = tmp_path / "lecture.mp4"
+        video.write_bytes(b"video")
+        monkeypatch.setenv("LOCAL_MEDIA_ROOTS", str(tmp_path))
+        
+        response = client.post("/api/extract/local", json={"path": str(video)})
+        
+        assert response.status_code == 200
+        assert calls[0]["video_path"] == video.resolve()
+    
+    def test_local_path_outside_roots_rejected(self, api, tmp_path, monkeypatch):
+        """Test that paths outside LOCAL_MEDIA_ROOTS are refused"""
+        client, calls = api
+        video = tmp_path / "lecture.mp4"
+        video.write_bytes(b"video")
+        monkeypatch.setenv("LOCAL_MEDIA_ROOTS", str(tmp_path / "media"))
+        
+        response = client.post("/api/extract/local", json={"path": str(video)})
+        
+        assert response.status_code == 403
+        assert calls == []
+    
+    def test_local_path_missing_file(self, api, tmp_path, monkeypatch):
+        """Test that a missing file is reported before a job is queued"""
+        client, calls = api
+        monkeypatch.setenv("LOCAL_MEDIA_ROOTS", str(tmp_path))
+        
+        response = client.post(
+            "/api/extract/local", json={"path": str(tmp_path / "missing.mp4")}
+        )
+        
+        assert response.status_code == 404
+        assert calls == []
+    
+    def test_upload_streamed_to_job_dir(self, api):
+        """Test that an upload lands in the job's temp directory intact"""
+        import main
+        client, calls = api
+        payload = os.urandom(3 * main.UPLOAD_CHUNK_SIZE // 2)
+        
+        response = client.post(
+            "/api/extract/upload",
+            files={"file": ("lecture.mkv", payload, "video/x-matroska")}
+        )
+        
+        assert response.status_code == 200
+        video_path = calls[0]["video_path"]
+        try:
+            assert video_path.suffix == ".mkv"
+            assert video_path.parent == main.TEMP_DIR / response.json()["job_id"]
+            assert video_path.read_bytes() == payload
+        finally:
+            main.video_processor.cleanup(video_path.parent)
+    
+    @pytest.mark.parametrize("size_known", [True, False])
+    def test_upload_over_limit_rejected(self, api, monkeypatch, size_known):
+        """Test that oversized uploads get 413 and leave nothing behind"""
+        import main
+        client, calls = api
+        monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", main.UPLOAD_CHUNK_SIZE)
+        if not size_known:
+            # Some clients don't declare a size: the limit applies while streaming
+            from starlette.datastructures import UploadFile
+            init = UploadFile.__init__
+            monkeypatch.setattr(
+                UploadFile, "__init__",
+                lambda self, *args, **kwargs: init(self, *args, **{**kwargs, "size": None})
+            )
+        before = set(main.TEMP_DIR.iterdir())
+        
+        response = client.post(
+            "/api/extract/upload",
+            files={"file": ("lecture.mp4", os.urandom(2 * main.UPLOAD_CHUNK_SIZE), "video/mp4")}
+        )
+        
+        assert response.status_code == 413
+        assert calls == []
+        assert set(main.TEMP_DIR.iterdir()) == before
+
+
+class TestPipeline:
+    """End-to-end run of the main extraction pipeline (OCR stubbed)"""
+    
+    async def run_pipeline(self, main, video_path: Path) -> dict:
+        """Helper to run process_video on a local file and return the job"""
+        main.jobs["pipeline-test"] = {"status": "queued", "progress": 0, "message": ""}
+        try:
+            await main.process_video(
+                job_id="pipeline-test", url=str(video_path), quality=None,
+                video_path=video_path
+            )
+            return main.jobs["pipeline-test"]
+        finally:
+            main.jobs.pop("pipeline-test", None)
+    
+    @pytest.fixture
+    def read(self):
+        """Shapes of the frames the stubbed OCR engine was called with"""
+        return []
+    
+    @pytest.fixture
+    def main(self, tmp_path, monkeypatch, read):
+        """main module with OCR stubbed and outputs/slide cache in tmp_path"""
+        import main
+        
+        async def fake_ocr(frame):
+            read.append(frame.shape)
+            return f"page {len(read)}"
+        
+        monkeypatch.setattr(main.ocr_engine, "extract_text", fake_ocr)
+        monkeypatch.setattr(main, "OUTPUT_DIR", tmp_path)
+        monkeypatch.setattr(main, "slide_cache", SlideCache(tmp_path / "slides.db"))
+        return main
+    
+    @pytest.mark.asyncio
+    async def test_local_video_to_pdf(self, main, read, tmp_path):
+        """Test that pages flow through cleaning and OCR into a PDF"""
+        slides = [create_slide(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "lecture.mp4", slides)
+        
+        job = await self.run_pipeline(main, video_path)
+        
+        assert job["status"] == "completed", job.get("error")
+        assert len(read) == 3
+        assert Path(job["pdf_path"]).stat().st_size > 0
+    
+    @pytest.mark.asyncio
+    async def test_failed_job_cleans_up(self, main, tmp_path, monkeypatch):
+        """Test that a job failing mid-way still closes its frame store and temp dir"""
+        video_path = write_test_video(tmp_path / "lecture.mp4", [create_slide(i) for i in range(3)])
+        stores = []
+        
+        class RecordingStore(main.FrameStore):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                stores.append(self)
+        
+        async def failing_ocr(frame):
+            raise RuntimeError("OCR crashed")
+        
+        monkeypatch.setattr(main, "FrameStore", RecordingStore)
+        monkeypatch.setattr(main.ocr_engine, "extract_text", failing_ocr)
+        job = await self.run_pipeline(main, video_path)
+        
+        assert job["status"] == "failed"
+        assert stores[0]._file.closed
+        assert not (main.TEMP_DIR / "pipeline-test").exists()
+    
+    @pytest.mark.asyncio
+    async def test_progress_follows_decoding(self, main, read, tmp_path, monkeypatch):
+        """Test that job progress advances with the decoded timestamp"""
+        video_path = write_test_video(tmp_path / "lecture.mp4", [create_slide(i) for i in range(3)])
+        
+        progress = []
+        report = main.report_detection_progress
+        
+        def recording_report(job_id, timestamp, start, end):
+            report(job_id, timestamp, start, end)
+            progress.append(main.jobs[job_id]["progress"])
+        
+        monkeypatch.setattr(main, "report_detection_progress", recording_report)
+        job = await self.run_pipeline(main, video_path)
+        
+        assert job["status"] == "completed", job.get("error")
+        assert progress == sorted(progress)
+        assert progress[0] == 25 and 80 <= progress[-1] <= 90
+    
+    @pytest.mark.asyncio
+    async def test_capture_cropped_to_slide(self, main, read, tmp_path):
+        """Test that every stage only sees the slide area of a capture"""
+        captures = [create_capture(i) for i in range(3)]
+        video_path = write_test_video(tmp_path / "talk.mp4", captures, seconds_per_slide=15.0, fps=2)
+        
+        job = await self.run_pipeline(main, video_path)
+        
+        assert job["status"] == "completed", job.get("error")
+        assert len(read) == 3
+        assert all(abs(w - 800) <= 12 and abs(h - 600) <= 12 for h, w, _ in read)
+    
+    @pytest.mark.asyncio
+    async def test_known_slides_skip_cleaning_and_ocr(self, main, read, tmp_path, monkeypatch):
+        """Test that slides seen in an earlier video come from the slide cache"""
+        slides = [create_slide(i) for i in range(4)]
+        write_test_video(tmp_path / "part1.mp4", slides[:3])
+        write_test_video(tmp_path / "part2.mp4", [slides[0], slides[3]])
+        
+        await self.run_pipeline(main, tmp_path / "part1.mp4")
+        
+        cleaned = []
+        original_clean = main.frame_cleaner.remove_obstructions
+        
+        async def counting_clean(frame, tracker=None):
+            cleaned.append(frame)
+            return await original_clean(frame, tracker=tracker)
+        
+        monkeypatch.setattr(main.frame_cleaner, "remove_obstructions", counting_clean)
+        
+        pdf_pages = []
+        create_pdf = main.pdf_generator.create_searchable_pdf
+        
+        async def recording_pdf(frames_with_text, pdf_path):
+            pdf_pages.extend(item["image"] for item in frames_with_text)
+            return await create_pdf(frames_with_text, pdf_path)
+        
+        monkeypatch.setattr(main.pdf_generator, "create_searchable_pdf", recording_pdf)
+        job = await self.run_pipeline(main, tmp_path / "part2.mp4")
+        
+        assert job["status"] == "completed", job.get("error")
+        # Only the new slide went through cleaning and OCR
+        assert len(cleaned) == 1
+        assert len(read) == 4
+        # Cached slides are read back from the frame store, not held in memory
+        assert len(pdf_pages) == 2
+        assert all(isinstance(image, np.memmap) for image in pdf_pages)
+
+
+class TestProductionServer:
+    """End-to-end run of production_server's pipeline (download and OCR stubbed)"""
+    
+    def test_video_to_pdf(self, tmp_path, monkeypatch, fake_ytdl):
+        """Test that a job completes, reports its pages and cleans up"""
+        import pytesseract
+        import production_server
+        
+        video_path = write_test_video(tmp_path / "lecture.mp4", [create_slide(i) for i in range(3)])
+        fake_ytdl.video = video_path.read_bytes()
+        fake_ytdl.info = {"duration": 9}
+        monkeypatch.setattr(pytesseract, "image_to_string", lambda image: "Slide")
+        monkeypatch.setattr(production_server, "TEMP_DIR", tmp_path / "temp")
+        monkeypatch.setattr(production_server, "OUTPUT_DIR", tmp_path)
+        (tmp_path / "temp").mkdir()
+        
+        production_server.jobs["server-test"] = {"status": "queued", "progress": 0, "message": ""}
+        try:
+            production_server.process_video("server-test", "u", "720p")
+            job = production_server.jobs["server-test"]
+        finally:
+            production_server.jobs.pop("server-test", None)
+        
+        assert job["status"] == "completed", job.get("error")
+        assert job["message"] == "Successfully extracted 3 pages"
+        assert Path(job["pdf_path"]).stat().st_size > 0
+        assert not (tmp_path / "temp" / "server-test").exists()
+
+
 class TestOCREngine:
     """Test OCR text extraction"""
     